@@ -0,0 +1,232 @@
+'''
+Batch well log interpretation over many wells.
+
+Runs the petrophysics.interpret() chain (VCL -> PHIE -> SW -> BVW) on N wells
+on a process pool and writes one <well>_analysis_results.csv per well, in the
+layout of well_log_analysis_results.csv:
+
+    DEPTH, GR, RT, NPHI, RHOB, LITHOLOGY, VSHALE, POROSITY, SW, NET_PAY, HCPV
+
+Wells are LAS files or columnar caches written by lastotext.py (.json/.bin).
+Parameters come from a table (CSV or DataFrame) with a WELL column, optional
+TOP and BOTTOM columns, and one column per parameter to override (any key of
+petrophysics.DEFAULT_PARAMS or BATCH_DEFAULTS):
+- WELL = "*" applies to every well;
+- a row without TOP/BOTTOM applies to the whole well;
+- a row with TOP/BOTTOM applies to that zone only, and wins over the others.
+Zone values become per-sample parameter arrays, which interpret() broadcasts.
+
+Usage:
+    python batch_interpretation.py 'logs/*.las' --params params.csv --output-dir results --workers 8
+'''
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from las_reader import read_data, read_header
+from lastotext import expand_inputs
+from log_cache import header_metadata, load_log_cache
+from petrophysics import DEFAULT_PARAMS, interpret
+
+# Net pay cutoffs and lithology thresholds, overridable per well or zone like the others
+BATCH_DEFAULTS = {
+    'vcl_cutoff': 0.4,
+    'phie_cutoff': 0.1,
+    'sw_cutoff': 0.5,
+    'shale_vcl': 0.5,
+    'porous_phie': 0.25,
+    'limestone_rhob': 2.6,
+}
+
+RESULT_COLUMNS = ['DEPTH', 'GR', 'RT', 'NPHI', 'RHOB', 'LITHOLOGY', 'VSHALE', 'POROSITY', 'SW', 'NET_PAY', 'HCPV']
+
+DEPTH_CURVES = ('DEPT', 'DEPTH', 'M__DEPTH', 'MD')
+RT_CURVES = ('ILD', 'RT', 'LLD', 'RD')
+PERCENT_UNITS = ('%', 'PU', 'P.U.')
+
+
+def _find(names, candidates):
+    for name in candidates:
+        if name in names:
+            return name
+    return None
+
+
+def load_well(source):
+    '''Return (well name, metadata, {curve: array}, {curve: unit}) for a LAS file or a columnar cache.'''
+    if source.lower().endswith('.las'):
+        header = read_header(source)
+        data = read_data(source, header=header)
+        meta = header_metadata(header, source)
+        curves = {name: data[:, i] for i, name in enumerate(header.curve_names)}
+        units = dict(zip(header.curve_names, header.curve_units))
+    else:
+        meta, curves = load_log_cache(source)
+        units = {curve['name']: curve['unit'] for curve in meta['curves']}
+    name = os.path.splitext(os.path.basename(source))[0]
+    return name, meta, curves, units
+
+
+def well_rows(table, names):
+    '''Rows of the parameter table that apply to a well known under any of names.'''
+    if table is None or table.empty:
+        return table
+    return table[table['WELL'].astype(str).isin(set(names) | {'*'})]
+
+
+def sample_params(rows, depth):
+    '''Merge the parameter rows of one well into scalars or per-sample arrays.
+
+    Defaults, then "*" rows, then well-wide rows, then zones (in table order);
+    a parameter that differs by zone becomes an array over depth.
+    '''
+    params = dict(DEFAULT_PARAMS, **BATCH_DEFAULTS)
+    if rows is None or rows.empty:
+        return params
+
+    has_zones = 'TOP' in rows.columns and 'BOTTOM' in rows.columns
+    zoned = rows[rows['TOP'].notna() & rows['BOTTOM'].notna()] if has_zones else rows.iloc[:0]
+    whole = rows.drop(zoned.index)
+    whole = pd.concat([whole[whole['WELL'].astype(str) == '*'], whole[whole['WELL'].astype(str) != '*']])
+    keys = [key for key in rows.columns if key in params]
+
+    for _, row in whole.iterrows():
+        params.update({key: row[key] for key in keys if pd.notna(row[key])})
+
+    for _, row in zoned.iterrows():
+        in_zone = (depth >= row['TOP']) & (depth <= row['BOTTOM'])
+        if not in_zone.any():
+            continue
+        for key in keys:
+            if pd.isna(row[key]) or key == 'gr_correction':
+                continue
+            values = params[key]
+            if np.ndim(values) == 0:
+                values = np.full(depth.shape[0], values, dtype=float)
+            values[in_zone] = row[key]
+            params[key] = values
+    return params
+
+
+def classify_lithology(vcl, phie, rhob, params):
+    lithology = np.full(vcl.shape[0], 'SANDSTONE', dtype=object)
+    lithology[phie >= params['porous_phie']] = 'SANDSTONE_POROUS'
+    lithology[(rhob >= params['limestone_rhob']) & (vcl < params['shale_vcl'])] = 'LIMESTONE'
+    lithology[vcl >= params['shale_vcl']] = 'SHALE'
+    lithology[np.isnan(vcl) | np.isnan(phie)] = 'UNKNOWN'
+    return lithology
+
+
+def interpret_well(source, rows=None, output_dir='.'):
+    '''Interpret one well and write its results CSV; return a summary dict.'''
+    start = time.perf_counter()
+    name, meta, curves, units = load_well(source)
+    names = {name, meta.get('well_name'), meta.get('uwi')} - {None}
+
+    depth_curve = _find(curves, DEPTH_CURVES) or next(iter(curves))
+    rt_curve = _find(curves, RT_CURVES)
+    missing = [curve for curve, found in (('GR', 'GR' in curves), ('NPHI', 'NPHI' in curves),
+                                          ('RHOB', 'RHOB' in curves), ('RT/ILD', rt_curve)) if not found]
+    if missing:
+        raise KeyError(f'{source}: missing curves {missing}')
+
+    depth = np.asarray(curves[depth_curve], dtype=float)
+    nphi = np.asarray(curves['NPHI'], dtype=float)
+    # interpret() expects neutron porosity in %, the results table has it in v/v
+    if units.get('NPHI', '').upper() not in PERCENT_UNITS:
+        nphi = nphi * 100
+    logs = {'GR': curves['GR'], 'NPHI': nphi, 'RHOB': curves['RHOB'], 'ILD': curves[rt_curve]}
+
+    params = sample_params(well_rows(rows, names), depth)
+    out = interpret(logs, {key: value for key, value in params.items() if key in DEFAULT_PARAMS})
+
+    vcl, phie, sw = out['VCL'], out['PHIE'], out['SWa']
+    step = meta.get('depth', {}).get('step')
+    if not step:
+        step = np.nanmedian(np.diff(depth)) if depth.size > 1 else 0.0
+    step = abs(step)
+    with np.errstate(invalid='ignore'):
+        pay = (vcl < params['vcl_cutoff']) & (phie > params['phie_cutoff']) & (sw < params['sw_cutoff'])
+        net_pay = np.where(pay, step, 0.0)
+        result = pd.DataFrame({
+            'DEPTH': depth,
+            'GR': curves['GR'],
+            'RT': curves[rt_curve],
+            'NPHI': nphi / 100,
+            'RHOB': curves['RHOB'],
+            'LITHOLOGY': classify_lithology(vcl, phie, np.asarray(curves['RHOB'], dtype=float), params),
+            'VSHALE': vcl,
+            'POROSITY': phie,
+            'SW': sw,
+            'NET_PAY': net_pay,
+            'HCPV': phie * (1 - sw) * net_pay,
+        }, columns=RESULT_COLUMNS)
+
+    output = os.path.join(output_dir, f'{name}_analysis_results.csv')
+    result.to_csv(output, index=False)
+    return {'well': name, 'output': output, 'rows': len(result),
+            'net_pay': float(net_pay.sum()), 'hcpv': float(np.nansum(result['HCPV'])),
+            'seconds': time.perf_counter() - start}
+
+
+def read_params(params):
+    '''A parameter table from a CSV path or a DataFrame (None: defaults only).'''
+    if params is None:
+        return None
+    table = pd.read_csv(params) if isinstance(params, str) else params.copy()
+    if 'WELL' not in table.columns:
+        table['WELL'] = '*'
+    unknown = set(table.columns) - set(DEFAULT_PARAMS) - set(BATCH_DEFAULTS) - {'WELL', 'TOP', 'BOTTOM'}
+    if unknown:
+        raise KeyError(f'unknown parameter columns: {sorted(unknown)}')
+    return table
+
+
+def interpret_wells(sources, params=None, output_dir='.', workers=None, report=print):
+    '''Interpret many wells on a process pool; return the list of per-well summaries.
+
+    Failed wells are reported and returned with an "error" key.
+    '''
+    table = read_params(params)
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(interpret_well, source, table, output_dir): source for source in sources}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                # A malformed well or a worker that died fails that well only, as in lastotext.convert_batch
+                summary = {'well': futures[future], 'error': repr(e)}
+            summaries.append(summary)
+            if report:
+                if 'error' in summary:
+                    report(f'{summary["well"]}: FAILED ({summary["error"]})')
+                else:
+                    report(f'{summary["well"]}: {summary["rows"]} samples, net pay {summary["net_pay"]:.1f}, '
+                           f'{summary["seconds"]:.3f} s')
+    if report:
+        failed = sum('error' in s for s in summaries)
+        report(f'{len(summaries) - failed} wells interpreted, {failed} failed in {time.perf_counter() - start:.2f} s')
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Interpret many wells with shared parameter sets.')
+    parser.add_argument('wells', help='a LAS file or columnar cache, a directory of LAS files or a glob pattern')
+    parser.add_argument('--params', help='CSV parameter table (WELL, TOP, BOTTOM, parameter columns)')
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    interpret_wells(expand_inputs(args.wells), args.params, args.output_dir, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+'''
+Density grids for Pickett and neutron-density crossplots.
+
+Instead of drawing one marker per sample, samples are binned into a fixed 2-D
+histogram (log-scaled on the log axes), and the histogram is drawn as an
+image. Drawing cost depends on the grid size only, so millions of samples from
+many wells plot as fast as a few hundred. Grids have fixed edges and can be
+accumulated well by well with DensityGrid.add().
+
+Example:
+    grid = pickett_grid(logs.ILD, logs.PHIE, vcl=logs.VCL, vcl_limit=0.1)
+    ax = plot_grid(grid)
+    rt = iso_saturation_lines(a=1, rw=0.45, m=1.8, n=2)
+'''
+import numpy as np
+
+# Axis ranges of the notebook plots
+PICKETT_RT_RANGE = (0.1, 1000)
+PICKETT_PHIE_RANGE = (0.01, 1)
+ND_NPHI_RANGE = (-5, 60)
+ND_RHOB_RANGE = (1.5, 3)
+
+DEFAULT_BINS = (200, 200)
+DEFAULT_SW_LINES = (1.0, 0.8, 0.6, 0.4, 0.2)
+
+
+class DensityGrid:
+    '''A 2-D histogram with fixed, optionally log-spaced, edges.'''
+
+    def __init__(self, x_range, y_range, bins=DEFAULT_BINS, log_x=False, log_y=False):
+        self.log_x, self.log_y = log_x, log_y
+        self.x_edges = self._edges(x_range, bins[0], log_x)
+        self.y_edges = self._edges(y_range, bins[1], log_y)
+        self.counts = np.zeros((bins[0], bins[1]), dtype=np.int64)
+
+    @staticmethod
+    def _edges(value_range, bins, log):
+        lo, hi = value_range
+        if log:
+            if lo <= 0:
+                raise ValueError('a log axis needs a positive range')
+            return np.logspace(np.log10(lo), np.log10(hi), bins + 1)
+        return np.linspace(lo, hi, bins + 1)
+
+    def add(self, x, y, mask=None):
+        '''Bin more samples; NaN, non-positive values on log axes and masked samples are dropped.'''
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        keep = np.isfinite(x) & np.isfinite(y)
+        if mask is not None:
+            keep &= np.asarray(mask, dtype=bool)
+        if self.log_x:
+            keep &= x > 0
+        if self.log_y:
+            keep &= y > 0
+        x, y = x[keep], y[keep]
+        # Edges are evenly spaced (in log space on log axes): bin by arithmetic and count with bincount
+        ix = self._bin_index(np.log10(x) if self.log_x else x, self.x_edges, self.log_x)
+        iy = self._bin_index(np.log10(y) if self.log_y else y, self.y_edges, self.log_y)
+        inside = (ix >= 0) & (iy >= 0)
+        nx, ny = self.counts.shape
+        flat = np.bincount(ix[inside] * ny + iy[inside], minlength=nx * ny)
+        self.counts += flat.reshape(nx, ny)
+        return self
+
+    @staticmethod
+    def _bin_index(values, edges, log):
+        '''Bin of every value, -1 outside the edges; the last bin includes its right edge.'''
+        lo, hi = (np.log10(edges[0]), np.log10(edges[-1])) if log else (edges[0], edges[-1])
+        bins = edges.shape[0] - 1
+        # Rounding can put a value just below hi (or hi itself) in bin `bins`: it belongs to the last one
+        index = np.minimum(np.floor((values - lo) / (hi - lo) * bins), bins - 1).astype(np.int64)
+        index[(values < lo) | (values > hi)] = -1
+        return index
+
+    def merge(self, other):
+        '''Add the counts of a grid with the same edges (e.g. computed in another process).'''
+        if not (np.array_equal(self.x_edges, other.x_edges) and np.array_equal(self.y_edges, other.y_edges)):
+            raise ValueError('grids have different edges')
+        self.counts += other.counts
+        return self
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    @property
+    def x_centers(self):
+        return np.sqrt(self.x_edges[:-1] * self.x_edges[1:]) if self.log_x else \
+            (self.x_edges[:-1] + self.x_edges[1:]) / 2
+
+    @property
+    def y_centers(self):
+        return np.sqrt(self.y_edges[:-1] * self.y_edges[1:]) if self.log_y else \
+            (self.y_edges[:-1] + self.y_edges[1:]) / 2
+
+
+def pickett_grid(rt, phie, vcl=None, vcl_limit=None, bins=DEFAULT_BINS,
+                 rt_range=PICKETT_RT_RANGE, phie_range=PICKETT_PHIE_RANGE):
+    '''Log-log density grid of resistivity vs effective porosity, optionally for VCL < vcl_limit.'''
+    mask = None
+    if vcl is not None and vcl_limit is not None:
+        with np.errstate(invalid='ignore'):
+            mask = np.asarray(vcl, dtype=float) < vcl_limit
+    return DensityGrid(rt_range, phie_range, bins, log_x=True, log_y=True).add(rt, phie, mask)
+
+
+def nd_grid(nphi, rhob, bins=DEFAULT_BINS, nphi_range=ND_NPHI_RANGE, rhob_range=ND_RHOB_RANGE):
+    '''Linear density grid of neutron porosity (%) vs bulk density.'''
+    return DensityGrid(nphi_range, rhob_range, bins).add(nphi, rhob)
+
+
+def iso_saturation_lines(a, rw, m, n, sw=DEFAULT_SW_LINES, phie=PICKETT_PHIE_RANGE):
+    '''Resistivity of the Archie iso-saturation lines: array of shape (len(sw), len(phie)).
+
+    Row i is Rt = a * Rw / (SW_i^n * PHIE^m) at the given porosities; the
+    lines are straight on a log-log Pickett plot, so two porosities suffice.
+    '''
+    sw = np.asarray(sw, dtype=float)[:, np.newaxis]
+    phie = np.asarray(phie, dtype=float)[np.newaxis, :]
+    return (a * rw) / (sw ** n) / (phie ** m)
+
+
+def plot_grid(grid, ax=None, cmap='viridis', colorbar=True):
+    '''Draw a DensityGrid as an image (empty bins left blank) and set log axes where needed.'''
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    if ax is None:
+        ax = plt.gca()
+    counts = np.ma.masked_equal(grid.counts.T, 0)
+    mesh = ax.pcolormesh(grid.x_edges, grid.y_edges, counts, cmap=cmap,
+                         norm=LogNorm(vmin=1, vmax=max(int(counts.max() or 1), 1)))
+    if grid.log_x:
+        ax.set_xscale('log')
+    if grid.log_y:
+        ax.set_yscale('log')
+    if colorbar:
+        ax.figure.colorbar(mesh, ax=ax, label='samples')
+    return ax
+
+
+def plot_pickett(grid, a, rw, m, n, sw=DEFAULT_SW_LINES, ax=None):
+    '''Pickett plot: the density grid plus the iso-saturation lines.'''
+    ax = plot_grid(grid, ax)
+    phie = np.array([grid.y_edges[0], grid.y_edges[-1]])
+    for sw_value, rt in zip(sw, iso_saturation_lines(a, rw, m, n, sw, phie)):
+        ax.plot(rt, phie, label='SW ' + str(int(sw_value * 100)) + '%')
+    ax.set_xlim(grid.x_edges[0], grid.x_edges[-1])
+    ax.set_ylim(grid.y_edges[0], grid.y_edges[-1])
+    ax.set_xlabel('ILD [m.ohm]')
+    ax.set_ylabel('PHIE [v/v]')
+    ax.legend(loc='best')
+    ax.grid(True, which='both', ls='-', color='gray')
+    return ax
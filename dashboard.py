@@ -1,12 +1,25 @@
 # petroleum_dashboard.py
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, Patch, ctx
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import os
+import threading
 import warnings
+from collections import namedtuple
+
+from data_watcher import SourceWatcher, file_signature
+from decline import DeclineFits, model_name
+from downsample import axis_range, lttb_indices, minmax_indices, target_points, window_rows
+from figure_cache import FigureCache
+from lazy_data import PRELOAD, LazyValue, preload
+from production_store import ProductionStore
+from shared_snapshot import SharedSnapshots, shareable
+from well_aggregates import WellAggregates
 
 warnings.filterwarnings('ignore')
 
@@ -15,17 +28,20 @@ app = dash.Dash(__name__)
 server = app.server
 
 
-# Function to load and process data from your CSV files
-def load_data():
-    # Initialize empty DataFrames with different names to avoid shadowing
-    well_df = pd.DataFrame()
-    production_df = pd.DataFrame()
-    portfolio_df = pd.DataFrame()
-    economic_df = pd.DataFrame()
+# Data source files
+WELL_FILE = 'advanced_well_analysis.csv'
+PRODUCTION_FILE = 'advanced_production_data.csv'
+PORTFOLIO_FILE = 'project_portfolio.csv'
+ECONOMIC_FILE = 'economic_analysis_results.csv'
+
+# Seconds between two checks of the source files for changes
+WATCH_INTERVAL = 5.0
 
-    # Try to load each CSV file with error handling
+
+# Functions to load and process data from your CSV files, one per file
+def load_well_data():
     try:
-        well_df = pd.read_csv('advanced_well_analysis.csv')
+        well_df = pd.read_csv(WELL_FILE)
         print("Well data loaded successfully")
     except FileNotFoundError:
         print("Well data file not found. Using sample data.")
@@ -40,9 +56,12 @@ def load_data():
             'LITHOLOGY': np.random.choice(['SHALE', 'SANDSTONE', 'LIMESTONE'], len(depth), p=[0.4, 0.4, 0.2]),
             'WELL': 'Sample_Well'
         })
+    return well_df
+
 
+def load_production_data():
     try:
-        production_df = pd.read_csv('advanced_production_data.csv')
+        production_df = pd.read_csv(PRODUCTION_FILE)
         production_df['DATE'] = pd.to_datetime(production_df['DATE'])
         print("Production data loaded successfully")
     except FileNotFoundError:
@@ -56,9 +75,12 @@ def load_data():
             'WATER_CUT': np.linspace(0.1, 0.7, 36) * np.random.normal(1, 0.05, 36),
             'WELL': 'Sample_Well'
         })
+    return production_df
 
+
+def load_portfolio_data():
     try:
-        portfolio_df = pd.read_csv('project_portfolio.csv')
+        portfolio_df = pd.read_csv(PORTFOLIO_FILE)
         print("Portfolio data loaded successfully")
     except FileNotFoundError:
         print("Portfolio data file not found. Using sample data.")
@@ -71,9 +93,12 @@ def load_data():
             'NPV_MM': np.random.normal(500, 200, 10),
             'IRR': np.random.uniform(0.1, 0.4, 10)
         })
+    return portfolio_df
+
 
+def load_economic_data():
     try:
-        economic_df = pd.read_csv('economic_analysis_results.csv')
+        economic_df = pd.read_csv(ECONOMIC_FILE)
         print("Economic data loaded successfully")
     except FileNotFoundError:
         print("Economic data file not found. Using sample data.")
@@ -85,134 +110,173 @@ def load_data():
             'CAPEX_MM': [1200, 1200, 1200, 1000],
             'Risk_Score': [5.2, 7.8, 3.2, 4.5]
         })
+    return economic_df
 
-    return well_df, production_df, portfolio_df, economic_df
 
+def load_data():
+    return load_well_data(), load_production_data(), load_portfolio_data(), load_economic_data()
 
-# Load the data
-well_data, production_data, portfolio_data, economic_data = load_data()
 
-# Define the layout of the dashboard
-app.layout = html.Div([
-    html.H1("Petroleum Engineering Analytics Dashboard",
-            style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': 30}),
+# Source file -> (snapshot field, loader)
+SOURCES = {
+    WELL_FILE: ('well', load_well_data),
+    PRODUCTION_FILE: ('production', load_production_data),
+    PORTFOLIO_FILE: ('portfolio', load_portfolio_data),
+    ECONOMIC_FILE: ('economic', load_economic_data),
+}
+
+# Per-well performance metrics, built once and updated with the appended rows only
+METRIC_COLUMNS = ['OIL_RATE', 'WATER_RATE', 'WATER_CUT']
+
+# Rates forecast with the decline curves fitted per well when the data is loaded
+DECLINE_COLUMNS = ['OIL_RATE', 'WATER_RATE', 'LIQUID_RATE']
+FORECAST_MONTHS = 12
+
+
+def build_aggregates(production_df):
+    if not set(METRIC_COLUMNS).issubset(production_df.columns):
+        return None
+    return WellAggregates(production_df, METRIC_COLUMNS)
+
+
+# All the data of the dashboard at one point in time. A snapshot is never modified:
+# a reload builds a new one and swaps it in, so a callback that reads the snapshot
+# once sees consistent data even while a reload is in progress.
+DashboardData = namedtuple('DashboardData', ['version', 'well', 'production', 'portfolio', 'economic',
+                                             'production_store', 'production_aggregates', 'production_declines'])
+
+# In preload mode the snapshots are published in shared memory: the forked workers map the
+# same columns instead of each keeping a copy, and attach every snapshot reloaded later
+shared = SharedSnapshots('dashboard') if PRELOAD else None
+
+
+def build_snapshot(version, well, production, portfolio, economic, production_store=None,
+                   production_aggregates=None, production_declines=None):
+    if shared is not None:
+        # Repeated strings as categoricals, so that they are shared as well
+        well, production, portfolio, economic = (shareable(frame) for frame in (well, production, portfolio, economic))
+    if production_store is None:
+        production_store = ProductionStore(production)
+    if production_aggregates is None:
+        production_aggregates = build_aggregates(production)
+    if production_declines is None:
+        production_declines = DeclineFits(production, DECLINE_COLUMNS)
+    return DashboardData(version, well, production, portfolio, economic, production_store, production_aggregates,
+                         production_declines)
 
-    # Filters and controls
-    html.Div([
-        html.Div([
-            html.Label("Select Well:", style={'fontWeight': 'bold'}),
-            dcc.Dropdown(
-                id='well-selector',
-                options=[{'label': well, 'value': well} for well in well_data['WELL'].unique()],
-                value=well_data['WELL'].iloc[0] if 'WELL' in well_data.columns else 'Sample_Well',
-                clearable=False
-            )
-        ], style={'width': '24%', 'display': 'inline-block', 'marginRight': '1%'}),
 
-        html.Div([
-            html.Label("Date Range:", style={'fontWeight': 'bold'}),
-            dcc.DatePickerRange(
-                id='date-range',
-                start_date=production_data['DATE'].min() if not production_data.empty else datetime(2020, 1, 1),
-                end_date=production_data['DATE'].max() if not production_data.empty else datetime(2022, 12, 31),
-                display_format='YYYY-MM-DD'
-            )
-        ], style={'width': '32%', 'display': 'inline-block', 'marginRight': '1%'}),
+# Signatures of the source files the first snapshot was parsed from
+source_signatures = {}
 
-        html.Div([
-            html.Label("Production Type:", style={'fontWeight': 'bold'}),
-            dcc.Dropdown(
-                id='production-type',
-                options=[
-                    {'label': 'Oil', 'value': 'OIL_RATE'},
-                    {'label': 'Water', 'value': 'WATER_RATE'},
-                    {'label': 'Water Cut', 'value': 'WATER_CUT'}
-                ],
-                value='OIL_RATE',
-                clearable=False
-            )
-        ], style={'width': '24%', 'display': 'inline-block', 'marginRight': '1%'}),
 
-        html.Div([
-            html.Label("Chart Theme:", style={'fontWeight': 'bold'}),
-            dcc.Dropdown(
-                id='theme-selector',
-                options=[
-                    {'label': 'Plotly White', 'value': 'plotly_white'},
-                    {'label': 'Plotly Dark', 'value': 'plotly_dark'},
-                    {'label': 'GGPlot2', 'value': 'ggplot2'}
-                ],
-                value='plotly_white',
-                clearable=False
-            )
-        ], style={'width': '18%', 'display': 'inline-block'}),
-    ], style={'marginBottom': 30, 'padding': 10, 'borderRadius': 5, 'backgroundColor': '#f8f9fa'}),
-
-    # First row of charts
-    html.Div([
-        html.Div([
-            dcc.Graph(id='production-trend-chart')
-        ], style={'width': '49%', 'display': 'inline-block'}),
+def share_snapshot(data):
+    '''The snapshot to install: its shared memory copy when it is shared with worker processes.'''
+    return shared.publish(data, data.version) if shared is not None else data
 
-        html.Div([
-            dcc.Graph(id='economic-analysis-chart')
-        ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'}),
-    ]),
 
-    # Second row of charts
-    html.Div([
-        html.Div([
-            dcc.Graph(id='well-log-chart')
-        ], style={'width': '32%', 'display': 'inline-block'}),
+def load_snapshot():
+    source_signatures.update({path: file_signature(path) for path in SOURCES})
+    return share_snapshot(build_snapshot(0, *load_data()))
 
-        html.Div([
-            dcc.Graph(id='portfolio-analysis-chart')
-        ], style={'width': '32%', 'display': 'inline-block', 'marginLeft': '2%'}),
 
-        html.Div([
-            dcc.Graph(id='forecast-chart')
-        ], style={'width': '32%', 'display': 'inline-block', 'marginLeft': '2%'}),
-    ], style={'marginTop': 20}),
+# The data is loaded on first use (or at import in preload mode), not when the module is imported
+snapshot = LazyValue(load_snapshot)
+snapshot_lock = threading.Lock()   # serializes the writers; readers never wait
+watcher = None
+watcher_lock = threading.Lock()
 
-    # Third row of charts
-    html.Div([
-        html.Div([
-            dcc.Graph(id='risk-analysis-chart')
-        ], style={'width': '49%', 'display': 'inline-block'}),
+# Figures already served, keyed by the callback inputs and the snapshot version
+figure_cache = FigureCache()
 
-        html.Div([
-            dcc.Graph(id='performance-metrics-chart')
-        ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'}),
-    ], style={'marginTop': 20}),
-])
 
+def watch_sources():
+    '''Start watching the source files in this process (threads do not survive a fork).'''
+    global watcher
+    if watcher is None or watcher.pid != os.getpid():
+        with watcher_lock:
+            if watcher is None or watcher.pid != os.getpid():
+                watcher = SourceWatcher(SOURCES, reload_data, WATCH_INTERVAL, source_signatures).start()
+
+
+def get_data():
+    '''The current snapshot; loads it on first use and starts watching the source files.'''
+    data = snapshot.get()
+    if shared is not None and shared.pid != os.getpid():
+        # A forked worker: the process that loaded the data watches the files and publishes
+        # the new snapshots, the worker attaches the latest one
+        if shared.version != data.version:
+            data = shared.attach()
+            snapshot.set(data)
+        return data
+    watch_sources()
+    return data
+
+
+def swap_snapshot(**changes):
+    '''Install a new snapshot with some fields changed and drop the cached figures.'''
+    current = snapshot.get()
+    fields = current._asdict()
+    fields.update(changes)
+    fields['version'] = current.version + 1
+    if 'production' in changes:
+        # Derived from the production table: rebuilt unless given
+        fields['production_store'] = None
+        fields['production_aggregates'] = changes.get('production_aggregates')
+        fields['production_declines'] = None
+    new = share_snapshot(build_snapshot(**fields))
+    snapshot.set(new)
+    figure_cache.clear()
+    return new
+
+
+def reload_data(paths=None):
+    '''Reparse the given source files (all by default) and swap in a new snapshot.'''
+    with snapshot_lock:
+        return swap_snapshot(**{SOURCES[path][0]: SOURCES[path][1]() for path in (paths or SOURCES)})
+
+
+def append_production(rows):
+    '''Add new production rows (WELL, DATE, rates) without reloading the CSV files.'''
+    rows = rows.assign(DATE=pd.to_datetime(rows['DATE']))
+    with snapshot_lock:
+        current = snapshot.get()
+        aggregates = current.production_aggregates
+        if aggregates is not None:
+            aggregates = aggregates.copy().append(rows)
+        return swap_snapshot(production=pd.concat([current.production, rows], ignore_index=True),
+                             production_aggregates=aggregates)
+
+
+@server.route('/figure-cache')
+def figure_cache_stats():
+    return dict(figure_cache.stats(), data_version=snapshot.get().version if snapshot.loaded else None,
+                shared_version=shared.version if shared is not None else None,
+                reloads=watcher.reloads if watcher else 0, reload_errors=watcher.errors if watcher else 0)
+
+
+DEFAULT_THEME = 'plotly_white'
 
-# Callback to update all charts based on user input
-@app.callback(
-    [Output('production-trend-chart', 'figure'),
-     Output('economic-analysis-chart', 'figure'),
-     Output('well-log-chart', 'figure'),
-     Output('portfolio-analysis-chart', 'figure'),
-     Output('forecast-chart', 'figure'),
-     Output('risk-analysis-chart', 'figure'),
-     Output('performance-metrics-chart', 'figure')],
-    [Input('well-selector', 'value'),
-     Input('date-range', 'start_date'),
-     Input('date-range', 'end_date'),
-     Input('production-type', 'value'),
-     Input('theme-selector', 'value')]
-)
-def update_dashboard(selected_well, start_date, end_date, production_type, theme):
-    # Filter data based on user selection
-    filtered_production = production_data[
-        (production_data['WELL'] == selected_well) &
-        (production_data['DATE'] >= start_date) &
-        (production_data['DATE'] <= end_date)
-        ] if not production_data.empty else pd.DataFrame()
 
-    filtered_well = well_data[well_data['WELL'] == selected_well] if not well_data.empty else pd.DataFrame()
+# Figure builders: each one depends only on the inputs it is given. The static charts are
+# built at import, so a CSV without the expected columns gives an empty chart, not an error.
+def empty_figure(title, theme, **layout):
+    fig = go.Figure()
+    fig.update_layout(title=title, template=theme, **layout)
+    return fig
+
+
+def filter_production(data, selected_well, start_date, end_date):
+    # One partition lookup and two binary searches instead of a mask over every row
+    return data.production_store.select(selected_well, start_date, end_date)
+
+
+def production_figure(filtered_production, selected_well, production_type, theme, pixels=None, date_range=None):
+    # Only the zoomed date window, reduced to what the chart width can show
+    if not filtered_production.empty:
+        filtered_production = filtered_production.iloc[window_rows(filtered_production['DATE'], date_range)]
+        filtered_production = filtered_production.iloc[lttb_indices(
+            filtered_production['DATE'], filtered_production[production_type], target_points(pixels))]
 
-    # 1. Production Trend Chart
     if not filtered_production.empty:
         production_fig = px.line(
             filtered_production,
@@ -222,24 +286,53 @@ def update_dashboard(selected_well, start_date, end_date, production_type, theme
             template=theme
         )
     else:
-        production_fig = go.Figure()
-        production_fig.update_layout(
-            title="No production data available",
-            template=theme,
-            xaxis_title="Date",
-            yaxis_title="Production"
-        )
+        production_fig = empty_figure("No production data available", theme,
+                                      xaxis_title="Date", yaxis_title="Production")
 
     production_fig.update_layout(
         xaxis_title="Date",
         yaxis_title=production_type.replace("_", " "),
-        hovermode='x unified'
+        hovermode='x unified',
+        uirevision=f'{selected_well}|{production_type}'   # keep the user's zoom across refetches
+    )
+    return production_fig
+
+
+def forecast_figure(filtered_production, selected_well, production_type, theme, declines):
+    if not filtered_production.empty and production_type in filtered_production.columns:
+        forecast_fig = go.Figure()
+        forecast_fig.add_trace(go.Scatter(x=filtered_production['DATE'], y=filtered_production[production_type],
+                                          mode='lines', name='Historical'))
+
+        # Evaluate the decline curve fitted to the well when the data was loaded
+        forecast_dates = pd.date_range(
+            start=filtered_production['DATE'].max() + timedelta(days=30),
+            periods=FORECAST_MONTHS,
+            freq='M'
+        )
+        forecast_values = declines.forecast(selected_well, production_type, forecast_dates)
+        if forecast_values is not None:
+            forecast_fig.add_trace(go.Scatter(x=forecast_dates, y=forecast_values, mode='lines', name='Forecast'))
+            b = declines.fitted(selected_well, production_type)[2]
+            title = f'Production Forecast for {selected_well} ({model_name(b)} decline, b={b:g})'
+        else:
+            title = f'Production Forecast for {selected_well} (no decline curve for this series)'
+        forecast_fig.update_layout(title=title, template=theme, legend_title_text='Type')
+    else:
+        forecast_fig = empty_figure("No data available for forecasting", theme,
+                                    xaxis_title="Date", yaxis_title="Production")
+
+    forecast_fig.update_layout(
+        xaxis_title="Date",
+        yaxis_title=production_type.replace("_", " ")
     )
+    return forecast_fig
+
 
-    # 2. Economic Analysis Chart
-    if not economic_data.empty:
+def economic_figure(data, theme):
+    if {'Scenario', 'NPV_MM', 'IRR'}.issubset(data.economic.columns):
         economic_fig = px.bar(
-            economic_data,
+            data.economic,
             x='Scenario',
             y='NPV_MM',
             title='Economic Analysis by Scenario',
@@ -248,80 +341,63 @@ def update_dashboard(selected_well, start_date, end_date, production_type, theme
             color_continuous_scale='Viridis'
         )
     else:
-        economic_fig = go.Figure()
-        economic_fig.update_layout(
-            title="No economic data available",
-            template=theme,
-            xaxis_title="Scenario",
-            yaxis_title="NPV ($MM)"
-        )
+        economic_fig = empty_figure("No economic data available", theme,
+                                    xaxis_title="Scenario", yaxis_title="NPV ($MM)")
 
     economic_fig.update_layout(
         xaxis_title="Scenario",
         yaxis_title="NPV ($MM)"
     )
+    return economic_fig
 
-    # 3. Well Log Chart
-    if not filtered_well.empty:
-        well_log_fig = go.Figure()
 
-        # Add well log curves
-        if 'GR' in filtered_well.columns:
-            well_log_fig.add_trace(go.Scatter(
-                x=filtered_well['GR'],
-                y=filtered_well['DEPTH'],
-                name='Gamma Ray',
-                line=dict(color='green')
-            ))
+# Well log curves: (column, name, color, x axis)
+WELL_LOG_CURVES = [('GR', 'Gamma Ray', 'green', 'x'),
+                   ('RT', 'Resistivity', 'blue', 'x2'),
+                   ('NPHI', 'Neutron Porosity', 'red', 'x3'),
+                   ('RHOB', 'Density', 'orange', 'x4')]
 
-        if 'RT' in filtered_well.columns:
-            well_log_fig.add_trace(go.Scatter(
-                x=filtered_well['RT'],
-                y=filtered_well['DEPTH'],
-                name='Resistivity',
-                line=dict(color='blue'),
-                xaxis='x2'
-            ))
 
-        if 'NPHI' in filtered_well.columns:
-            well_log_fig.add_trace(go.Scatter(
-                x=filtered_well['NPHI'],
-                y=filtered_well['DEPTH'],
-                name='Neutron Porosity',
-                line=dict(color='red'),
-                xaxis='x3'
-            ))
+def well_log_figure(data, selected_well, theme, pixels=None, depth_range=None):
+    filtered_well = data.well[data.well['WELL'] == selected_well] if not data.well.empty else pd.DataFrame()
+    if filtered_well.empty:
+        return empty_figure("No well log data available", theme)
+
+    well_log_fig = go.Figure()
 
-        if 'RHOB' in filtered_well.columns:
+    # Add well log curves: the zoomed depth window, with the min and max of every
+    # bucket of samples for as many buckets as the chart height has pixels
+    filtered_well = filtered_well.sort_values('DEPTH')
+    filtered_well = filtered_well.iloc[window_rows(filtered_well['DEPTH'], depth_range)]
+    for column, name, color, xaxis in WELL_LOG_CURVES:
+        if column in filtered_well.columns:
+            rows = minmax_indices(filtered_well[column], target_points(pixels) // 2)
             well_log_fig.add_trace(go.Scatter(
-                x=filtered_well['RHOB'],
-                y=filtered_well['DEPTH'],
-                name='Density',
-                line=dict(color='orange'),
-                xaxis='x4'
+                x=filtered_well[column].iloc[rows],
+                y=filtered_well['DEPTH'].iloc[rows],
+                name=name,
+                line=dict(color=color),
+                xaxis=xaxis
             ))
 
-        well_log_fig.update_layout(
-            title=f'Well Logs for {selected_well}',
-            template=theme,
-            yaxis=dict(title='Depth', autorange='reversed'),
-            xaxis=dict(title='GR (API)', domain=[0, 0.2]),
-            xaxis2=dict(title='RT (ohm-m)', domain=[0.25, 0.45], type='log'),
-            xaxis3=dict(title='NPHI (v/v)', domain=[0.5, 0.7]),
-            xaxis4=dict(title='RHOB (g/cc)', domain=[0.75, 0.95]),
-            showlegend=True
-        )
-    else:
-        well_log_fig = go.Figure()
-        well_log_fig.update_layout(
-            title="No well log data available",
-            template=theme
-        )
+    well_log_fig.update_layout(
+        title=f'Well Logs for {selected_well}',
+        template=theme,
+        yaxis=dict(title='Depth', autorange='reversed'),
+        xaxis=dict(title='GR (API)', domain=[0, 0.2]),
+        xaxis2=dict(title='RT (ohm-m)', domain=[0.25, 0.45], type='log'),
+        xaxis3=dict(title='NPHI (v/v)', domain=[0.5, 0.7]),
+        xaxis4=dict(title='RHOB (g/cc)', domain=[0.75, 0.95]),
+        showlegend=True,
+        uirevision=selected_well
+    )
+    return well_log_fig
+
 
-    # 4. Portfolio Analysis Chart
-    if not portfolio_data.empty:
+def portfolio_figure(data, theme):
+    if not data.portfolio.empty:
         portfolio_fig = px.scatter(
-            portfolio_data,
+            data.portfolio,
             x='CAPEX_MM',
             y='NPV_MM',
             size='IRR',
@@ -331,121 +407,276 @@ def update_dashboard(selected_well, start_date, end_date, production_type, theme
             hover_name='Project_ID'
         )
     else:
-        portfolio_fig = go.Figure()
-        portfolio_fig.update_layout(
-            title="No portfolio data available",
-            template=theme,
-            xaxis_title="CAPEX ($MM)",
-            yaxis_title="NPV ($MM)"
-        )
+        portfolio_fig = empty_figure("No portfolio data available", theme,
+                                     xaxis_title="CAPEX ($MM)", yaxis_title="NPV ($MM)")
 
     portfolio_fig.update_layout(
         xaxis_title="CAPEX ($MM)",
         yaxis_title="NPV ($MM)"
     )
+    return portfolio_fig
+
+
+def risk_figure(data, theme):
+    if not {'Scenario', 'Risk_Score'}.issubset(data.economic.columns):
+        return empty_figure("No risk data available", theme)
+
+    risk_fig = go.Figure()
+
+    risk_fig.add_trace(go.Scatterpolar(
+        r=data.economic['Risk_Score'],
+        theta=data.economic['Scenario'],
+        fill='toself',
+        name='Risk Score'
+    ))
+
+    risk_fig.update_layout(
+        title='Risk Analysis by Scenario',
+        template=theme,
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 10]
+            )),
+        showlegend=False
+    )
+    return risk_fig
 
-    # 5. Forecast Chart
-    if not filtered_production.empty and production_type in filtered_production.columns:
-        # Create a simple forecast based on historical data
-        forecast_dates = pd.date_range(
-            start=filtered_production['DATE'].max() + timedelta(days=30),
-            periods=12,
-            freq='M'
-        )
 
-        last_value = filtered_production[production_type].iloc[-1]
-        forecast_values = [last_value * (0.97 ** i) for i in range(12)]
+def metrics_figure(data, theme):
+    if data.production.empty or data.production_aggregates is None:
+        return empty_figure("No performance data available", theme)
 
-        forecast_df = pd.DataFrame({
-            'DATE': forecast_dates,
-            production_type: forecast_values,
-            'Type': ['Forecast'] * 12
-        })
+    # Per-well means from the running aggregates instead of a groupby over every row
+    metrics_data = data.production_aggregates.means()
 
-        historical_df = pd.DataFrame({
-            'DATE': filtered_production['DATE'],
-            production_type: filtered_production[production_type],
-            'Type': ['Historical'] * len(filtered_production)
-        })
+    return px.scatter_matrix(
+        metrics_data,
+        dimensions=['OIL_RATE', 'WATER_RATE', 'WATER_CUT'],
+        title='Well Performance Metrics',
+        template=theme,
+        color='OIL_RATE',
+        hover_name='WELL'
+    )
 
-        combined_df = pd.concat([historical_df, forecast_df])
 
-        forecast_fig = px.line(
-            combined_df,
-            x='DATE',
-            y=production_type,
-            color='Type',
-            title=f'Production Forecast for {selected_well}',
-            template=theme
-        )
-    else:
-        forecast_fig = go.Figure()
-        forecast_fig.update_layout(
-            title="No data available for forecasting",
-            template=theme,
-            xaxis_title="Date",
-            yaxis_title="Production"
-        )
+def static_figure(data, build):
+    '''A chart that depends on no control, built once per snapshot.'''
+    return figure_cache.get_or_build((build.__name__, data.version, DEFAULT_THEME), lambda: build(data, DEFAULT_THEME))
 
-    forecast_fig.update_layout(
-        xaxis_title="Date",
-        yaxis_title=production_type.replace("_", " ")
-    )
 
-    # 6. Risk Analysis Chart
-    if not economic_data.empty:
-        risk_fig = go.Figure()
+# Define the layout of the dashboard: a function, so that it is built when a page is served
+# and not at import. Economic, portfolio, risk and metrics charts do not depend on any
+# control: they are built once per snapshot, and only their theme is patched afterwards.
+def serve_layout():
+    data = get_data()
+    return html.Div([
+        html.H1("Petroleum Engineering Analytics Dashboard",
+                style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': 30}),
 
-        risk_fig.add_trace(go.Scatterpolar(
-            r=economic_data['Risk_Score'],
-            theta=economic_data['Scenario'],
-            fill='toself',
-            name='Risk Score'
-        ))
+        # Pixel size of the charts, measured in the browser, for the downsampling
+        dcc.Store(id='graph-sizes'),
 
-        risk_fig.update_layout(
-            title='Risk Analysis by Scenario',
-            template=theme,
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 10]
-                )),
-            showlegend=False
-        )
-    else:
-        risk_fig = go.Figure()
-        risk_fig.update_layout(
-            title="No risk data available",
-            template=theme
-        )
+        # Filters and controls
+        html.Div([
+            html.Div([
+                html.Label("Select Well:", style={'fontWeight': 'bold'}),
+                dcc.Dropdown(
+                    id='well-selector',
+                    options=[{'label': well, 'value': well} for well in data.well['WELL'].unique()],
+                    value=data.well['WELL'].iloc[0] if 'WELL' in data.well.columns else 'Sample_Well',
+                    clearable=False
+                )
+            ], style={'width': '24%', 'display': 'inline-block', 'marginRight': '1%'}),
+
+            html.Div([
+                html.Label("Date Range:", style={'fontWeight': 'bold'}),
+                dcc.DatePickerRange(
+                    id='date-range',
+                    start_date=data.production['DATE'].min() if not data.production.empty else datetime(2020, 1, 1),
+                    end_date=data.production['DATE'].max() if not data.production.empty else datetime(2022, 12, 31),
+                    display_format='YYYY-MM-DD'
+                )
+            ], style={'width': '32%', 'display': 'inline-block', 'marginRight': '1%'}),
+
+            html.Div([
+                html.Label("Production Type:", style={'fontWeight': 'bold'}),
+                dcc.Dropdown(
+                    id='production-type',
+                    options=[
+                        {'label': 'Oil', 'value': 'OIL_RATE'},
+                        {'label': 'Water', 'value': 'WATER_RATE'},
+                        {'label': 'Water Cut', 'value': 'WATER_CUT'}
+                    ],
+                    value='OIL_RATE',
+                    clearable=False
+                )
+            ], style={'width': '24%', 'display': 'inline-block', 'marginRight': '1%'}),
+
+            html.Div([
+                html.Label("Chart Theme:", style={'fontWeight': 'bold'}),
+                dcc.Dropdown(
+                    id='theme-selector',
+                    options=[
+                        {'label': 'Plotly White', 'value': 'plotly_white'},
+                        {'label': 'Plotly Dark', 'value': 'plotly_dark'},
+                        {'label': 'GGPlot2', 'value': 'ggplot2'}
+                    ],
+                    value=DEFAULT_THEME,
+                    clearable=False
+                )
+            ], style={'width': '18%', 'display': 'inline-block'}),
+        ], style={'marginBottom': 30, 'padding': 10, 'borderRadius': 5, 'backgroundColor': '#f8f9fa'}),
+
+        # First row of charts
+        html.Div([
+            html.Div([
+                dcc.Graph(id='production-trend-chart')
+            ], style={'width': '49%', 'display': 'inline-block'}),
 
-    # 7. Performance Metrics Chart
-    if not production_data.empty:
-        metrics_data = production_data.groupby('WELL').agg({
-            'OIL_RATE': 'mean',
-            'WATER_RATE': 'mean',
-            'WATER_CUT': 'mean'
-        }).reset_index()
-
-        metrics_fig = px.scatter_matrix(
-            metrics_data,
-            dimensions=['OIL_RATE', 'WATER_RATE', 'WATER_CUT'],
-            title='Well Performance Metrics',
-            template=theme,
-            color='OIL_RATE',
-            hover_name='WELL'
-        )
-    else:
-        metrics_fig = go.Figure()
-        metrics_fig.update_layout(
-            title="No performance data available",
-            template=theme
-        )
+            html.Div([
+                dcc.Graph(id='economic-analysis-chart', figure=static_figure(data, economic_figure))
+            ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'}),
+        ]),
+
+        # Second row of charts
+        html.Div([
+            html.Div([
+                dcc.Graph(id='well-log-chart')
+            ], style={'width': '32%', 'display': 'inline-block'}),
+
+            html.Div([
+                dcc.Graph(id='portfolio-analysis-chart', figure=static_figure(data, portfolio_figure))
+            ], style={'width': '32%', 'display': 'inline-block', 'marginLeft': '2%'}),
+
+            html.Div([
+                dcc.Graph(id='forecast-chart')
+            ], style={'width': '32%', 'display': 'inline-block', 'marginLeft': '2%'}),
+        ], style={'marginTop': 20}),
+
+        # Third row of charts
+        html.Div([
+            html.Div([
+                dcc.Graph(id='risk-analysis-chart', figure=static_figure(data, risk_figure))
+            ], style={'width': '49%', 'display': 'inline-block'}),
+
+            html.Div([
+                dcc.Graph(id='performance-metrics-chart', figure=static_figure(data, metrics_figure))
+            ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'}),
+        ], style={'marginTop': 20}),
+    ])
 
-    return production_fig, economic_fig, well_log_fig, portfolio_fig, forecast_fig, risk_fig, metrics_fig
 
 
+# Charts whose template follows the theme selector
+THEMED_CHARTS = ['production-trend-chart', 'economic-analysis-chart', 'well-log-chart',
+                 'portfolio-analysis-chart', 'forecast-chart', 'risk-analysis-chart',
+                 'performance-metrics-chart']
+
+# Every component id used by the callbacks, so that Dash can check them without calling
+# serve_layout() (which would load the data) when the layout is assigned
+app.validation_layout = html.Div(
+    [dcc.Store(id='graph-sizes'), dcc.Dropdown(id='well-selector'), dcc.DatePickerRange(id='date-range'),
+     dcc.Dropdown(id='production-type'), dcc.Dropdown(id='theme-selector')] +
+    [dcc.Graph(id=chart) for chart in THEMED_CHARTS]
+)
+app.layout = serve_layout
+
+
+# Width of the production chart and height of the well log chart, read once in the browser
+app.clientside_callback(
+    """
+    function(id) {
+        var production = document.getElementById('production-trend-chart');
+        var wellLog = document.getElementById('well-log-chart');
+        return {production: production ? production.offsetWidth : null,
+                well_log: wellLog ? wellLog.offsetHeight : null};
+    }
+    """,
+    Output('graph-sizes', 'data'),
+    Input('graph-sizes', 'id')
+)
+
+
+# Production chart: depends on the well, date range and production type, and is
+# refetched at the resolution of the zoomed window when the user zooms or pans
+@app.callback(
+    Output('production-trend-chart', 'figure'),
+    [Input('well-selector', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('production-type', 'value'),
+     Input('production-trend-chart', 'relayoutData'),
+     Input('graph-sizes', 'data')],
+    State('theme-selector', 'value')
+)
+def update_production(selected_well, start_date, end_date, production_type, relayout, sizes, theme):
+    data = get_data()
+    pixels = (sizes or {}).get('production')
+    # A zoom only applies when it triggered the call: a new well or date range starts unzoomed
+    date_range = axis_range(relayout, 'xaxis') if ctx.triggered_id == 'production-trend-chart' else None
+    key = ('production', data.version, selected_well, start_date, end_date, production_type, theme, pixels,
+           date_range)
+    return figure_cache.get_or_build(key, lambda: production_figure(
+        filter_production(data, selected_well, start_date, end_date), selected_well, production_type, theme,
+        pixels, date_range))
+
+
+# Forecast chart: depends on the well, date range and production type
+@app.callback(
+    Output('forecast-chart', 'figure'),
+    [Input('well-selector', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('production-type', 'value')],
+    State('theme-selector', 'value')
+)
+def update_forecast(selected_well, start_date, end_date, production_type, theme):
+    data = get_data()
+    key = ('forecast', data.version, selected_well, start_date, end_date, production_type, theme)
+    return figure_cache.get_or_build(key, lambda: forecast_figure(
+        filter_production(data, selected_well, start_date, end_date), selected_well, production_type, theme,
+        data.production_declines))
+
+
+# Well log chart: depends on the well, refetched for the zoomed depth window
+@app.callback(
+    Output('well-log-chart', 'figure'),
+    [Input('well-selector', 'value'),
+     Input('well-log-chart', 'relayoutData'),
+     Input('graph-sizes', 'data')],
+    State('theme-selector', 'value')
+)
+def update_well_log(selected_well, relayout, sizes, theme):
+    data = get_data()
+    pixels = (sizes or {}).get('well_log')
+    depth_range = axis_range(relayout, 'yaxis') if ctx.triggered_id == 'well-log-chart' else None
+    key = ('well_log', data.version, selected_well, theme, pixels, depth_range)
+    return figure_cache.get_or_build(key, lambda: well_log_figure(data, selected_well, theme, pixels, depth_range))
+
+
+# Theme: patch the layout template of every chart instead of rebuilding the figures
+@app.callback(
+    [Output(chart, 'figure', allow_duplicate=True) for chart in THEMED_CHARTS],
+    Input('theme-selector', 'value'),
+    prevent_initial_call=True
+)
+def update_theme(theme):
+    template = pio.templates[theme].to_plotly_json()
+    patches = []
+    for _ in THEMED_CHARTS:
+        patch = Patch()
+        patch['layout']['template'] = template
+        patches.append(patch)
+    return patches
+
+
+# In preload mode, load and publish the data now so that forked workers share it; this
+# process keeps watching the source files and publishes the reloaded snapshots
+preload(snapshot)
+if shared is not None:
+    watch_sources()
+
 # Run the app
 if __name__ == '__main__':
     app.run_server(debug=True, port=8050)
\ No newline at end of file
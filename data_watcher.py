@@ -0,0 +1,93 @@
+'''
+Background watcher that reloads data files when they change.
+
+A daemon thread polls the (mtime, size) of every watched file. A file is
+reported once its new signature has held still for a whole polling interval,
+so a file that is still being written is not parsed half way. The callback
+gets the list of changed paths only, parses them off the request path and
+swaps in its new data; if it fails (bad or truncated file), the error is
+recorded and the current data stays in place until the file changes again.
+A file that disappears is not a change either (the loaders would fall back to
+sample data): the current data stays until the file is back.
+
+Example:
+    watcher = SourceWatcher(['advanced_production_data.csv'], reload_data, interval=5)
+    watcher.start()
+'''
+import os
+import threading
+
+DEFAULT_INTERVAL = 5.0
+
+
+def file_signature(path):
+    '''(mtime in ns, size) of a file, None if it does not exist.'''
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SourceWatcher:
+    '''Poll files on a daemon thread and call on_change(changed_paths) when some change.'''
+
+    def __init__(self, paths, on_change, interval=DEFAULT_INTERVAL, signatures=None):
+        '''signatures: those of the files as they were loaded, default their current ones.'''
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.interval = interval
+        signatures = signatures or {}
+        self.loaded = {path: signatures[path] if path in signatures else file_signature(path) for path in self.paths}
+        self.pending = {}
+        self.reloads = 0
+        self.errors = 0
+        self.last_error = None
+        self.pid = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        '''Poll once; return the paths passed to on_change.'''
+        changed = []
+        for path in self.paths:
+            signature = file_signature(path)
+            if signature is None or signature == self.loaded[path]:
+                # Unchanged, or missing (deleted or being replaced): nothing to reload until it is back
+                self.pending.pop(path, None)
+            elif self.pending.get(path) == signature:
+                changed.append(path)
+            else:
+                self.pending[path] = signature
+        if not changed:
+            return changed
+
+        try:
+            self.on_change(changed)
+            self.reloads += 1
+        except (OSError, ValueError, KeyError) as e:
+            self.errors += 1
+            self.last_error = f'{", ".join(changed)}: {e}'
+            print(f'Reload failed, keeping the current data ({self.last_error})')
+        # Either way, do not parse the same version of these files again
+        for path in changed:
+            self.loaded[path] = self.pending.pop(path)
+        return changed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='source-watcher', daemon=True)
+            self._thread.start()
+            self.pid = os.getpid()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,173 @@
+'''
+Arps decline curves fitted to every well at once.
+
+The Arps declines of learning_basic.ipynb, q(t) = qi / (1 + b di t) ** (1 / b),
+with b = 0 for the exponential decline (qi exp(-di t)) and b = 1 for the
+harmonic one, become straight lines once the rate is transformed:
+    ln q   = ln qi - di t                          (b = 0)
+    q ** -b = qi ** -b + qi ** -b b di t             (b > 0)
+For every b of a grid, the line of every well is fitted in one pass with
+grouped least squares sums (np.bincount over the well codes), and each well
+keeps the b with the smallest squared error on the rates themselves. No
+per-well loop and no iterative solver, so the whole table is fitted when the
+data is loaded, and a chart only evaluates the cached curve of one well.
+
+Time is in months since the first production date of the well, rates are in
+the unit of the data. arps_cumulative() and arps_eur() integrate the curves in
+closed form.
+
+Example:
+    declines = DeclineFits(production_data, ['OIL_RATE', 'WATER_RATE'])
+    declines.params('OIL_RATE')                     # qi, di, b, model, rmse per well
+    declines.forecast('Well_01', 'OIL_RATE', pd.date_range('2024-01-31', periods=12, freq='M'))
+'''
+import numpy as np
+import pandas as pd
+
+# b factors tried for every well: 0 is exponential, 1 harmonic, the others hyperbolic
+B_VALUES = np.round(np.linspace(0, 2, 21), 2)
+
+# Fewest points a well needs to be fitted
+MIN_POINTS = 3
+
+DAYS_PER_MONTH = 365.25 / 12
+
+# EUR horizon in months, as calculate_eur(t_max=300) in learning_basic.ipynb
+EUR_MONTHS = 300
+
+
+def arps_rate(t, qi, di, b):
+    '''Arps rate at time t (any broadcastable arrays or scalars); exponential where b is 0.'''
+    values = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (t, qi, di, b)))
+    scalar = values[0].ndim == 0
+    # At least 1-d, so that the rate can be set where the decline is hyperbolic
+    t, qi, di, b = (np.array(value, ndmin=1) for value in values)
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        rate = qi * np.exp(-di * t)
+        hyperbolic = b > 0
+        base = 1 + b[hyperbolic] * di[hyperbolic] * t[hyperbolic]
+        rate[hyperbolic] = np.where(base > 0, qi[hyperbolic] / base ** (1 / b[hyperbolic]), 0.0)
+    return rate[0] if scalar else rate
+
+
+def arps_cumulative(t, qi, di, b):
+    '''Cumulative production from 0 to t: the integral of arps_rate, in closed form.'''
+    t, qi, di, b = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (t, qi, di, b)))
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        exponential = qi / di * -np.expm1(-di * t)
+        harmonic = qi / di * np.log1p(di * t)
+        hyperbolic = qi / ((1 - b) * di) * (1 - (1 + b * di * t) ** (1 - 1 / b))
+        cumulative = np.where(b == 0, exponential, np.where(b == 1, harmonic, hyperbolic))
+    return np.where(di == 0, qi * t, cumulative)
+
+
+def arps_eur(qi, di, b, months=EUR_MONTHS, limit=0.0):
+    '''Estimated ultimate recovery: cumulative production until the rate falls to limit, at most months.'''
+    qi, di, b = (np.asarray(value, dtype=float) for value in (qi, di, b))
+    t = np.asarray(months, dtype=float)
+    if limit > 0:
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            ratio = qi / limit
+            to_limit = np.where(b == 0, np.log(ratio) / di, (ratio ** b - 1) / (b * di))
+        t = np.clip(np.where(np.isnan(to_limit), t, to_limit), 0, t)
+    return arps_cumulative(t, qi, di, b)
+
+
+def model_name(b):
+    return 'exponential' if b == 0 else 'harmonic' if b == 1 else 'hyperbolic'
+
+
+def fit_declines(t, q, codes, ngroups, b_values=B_VALUES):
+    '''Best Arps (qi, di, b, sse, count) arrays of every group, NaN where it cannot be fitted.
+
+    t, q and codes are arrays of the same length; rates that are not positive are ignored.
+    '''
+    t, q = np.asarray(t, dtype=float), np.asarray(q, dtype=float)
+    valid = np.isfinite(t) & np.isfinite(q) & (q > 0)
+    t, q, codes = t[valid], q[valid], np.asarray(codes)[valid]
+
+    # Sums of the least squares lines that do not depend on b
+    count = np.bincount(codes, minlength=ngroups)
+    sx = np.bincount(codes, weights=t, minlength=ngroups)
+    sxx = np.bincount(codes, weights=t * t, minlength=ngroups)
+
+    best = {name: np.full(ngroups, np.nan) for name in ('qi', 'di', 'b')}
+    best['sse'] = np.full(ngroups, np.inf)
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        for b in b_values:
+            y = np.log(q) if b == 0 else q ** -b
+            sy = np.bincount(codes, weights=y, minlength=ngroups)
+            sxy = np.bincount(codes, weights=t * y, minlength=ngroups)
+            slope = (count * sxy - sx * sy) / (count * sxx - sx * sx)
+            intercept = (sy - slope * sx) / count
+
+            if b == 0:
+                qi, di = np.exp(intercept), -slope
+                predicted = qi[codes] * np.exp(-di[codes] * t)
+            else:
+                qi, di = intercept ** (-1 / b), slope / (intercept * b)
+                # A hyperbola needs a positive intercept and a rate that declines
+                qi = np.where((intercept > 0) & (di >= 0), qi, np.nan)
+                predicted = qi[codes] / (1 + b * di[codes] * t) ** (1 / b)
+
+            residual = q - predicted
+            sse = np.bincount(codes, weights=residual * residual, minlength=ngroups)
+            better = np.isfinite(sse) & (sse < best['sse'])
+            best['qi'][better], best['di'][better], best['b'][better], best['sse'][better] = \
+                qi[better], di[better], b, sse[better]
+
+    unfitted = count < MIN_POINTS
+    for name in best:
+        best[name][unfitted] = np.nan
+    return best['qi'], best['di'], best['b'], best['sse'], count
+
+
+class DeclineFits:
+    '''Arps decline parameters of some rate columns, fitted per well when the data is loaded.'''
+
+    def __init__(self, frame, columns, key='WELL', date='DATE', b_values=B_VALUES):
+        self.key = key
+        self.date = date
+        self.columns = [column for column in columns if column in frame.columns]
+        self.tables = {}
+        if frame.empty or key not in frame.columns or date not in frame.columns:
+            self.start = pd.Series(dtype='datetime64[ns]')
+            self.tables = {column: pd.DataFrame(columns=['qi', 'di', 'b', 'model', 'rmse', 'points'])
+                           for column in self.columns}
+            return
+
+        frame = frame[frame[key].notna()]
+        codes, wells = pd.factorize(frame[key].to_numpy())
+        dates = pd.to_datetime(frame[date]).to_numpy()
+        first = pd.Series(dates).groupby(codes).min().to_numpy()
+        self.start = pd.Series(first, index=wells)
+        t = (dates - first[codes]) / np.timedelta64(1, 'D') / DAYS_PER_MONTH
+
+        for column in self.columns:
+            qi, di, b, sse, count = fit_declines(t, frame[column].to_numpy(dtype=float), codes, len(wells), b_values)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                rmse = np.sqrt(sse / count)
+            self.tables[column] = pd.DataFrame({
+                'qi': qi, 'di': di, 'b': b,
+                'model': [None if np.isnan(value) else model_name(value) for value in b],
+                'rmse': rmse, 'points': count}, index=wells)
+
+    def params(self, column):
+        '''Fitted parameters of every well for one column, as a DataFrame with the key column.'''
+        return self.tables[column].rename_axis(self.key).reset_index()
+
+    def fitted(self, well, column):
+        '''(qi, di, b) of a well, None when the column or the well has no fit.'''
+        table = self.tables.get(column)
+        if table is None or well not in table.index or np.isnan(table.at[well, 'b']):
+            return None
+        return table.at[well, 'qi'], table.at[well, 'di'], table.at[well, 'b']
+
+    def forecast(self, well, column, dates):
+        '''Rates of the fitted curve of a well at some dates, None when it has no fit.'''
+        params = self.fitted(well, column)
+        if params is None:
+            return None
+        dates = pd.to_datetime(pd.Index(dates)).to_numpy()
+        t = (dates - self.start[well].to_datetime64()) / np.timedelta64(1, 'D') / DAYS_PER_MONTH
+        return arps_rate(t, *params)
@@ -0,0 +1,208 @@
+'''
+Batch Arps decline fitting of many wells, for the nightly reforecast.
+
+Every well of a production table is fitted with scipy.optimize.curve_fit to
+each decline model of learning_basic.ipynb (exponential, hyperbolic, harmonic),
+the wells being split in chunks over a process pool. Each fit starts from a
+warm start: the INITIAL_RATE / DECLINE_RATE / B_FACTOR of the well when the
+table has them, the vectorized linearized fit of decline.fit_declines
+otherwise. A well keeps the model with the smallest squared error, and its EUR
+is computed in closed form (decline.arps_eur) instead of summing the rate
+month by month.
+
+From a warm start, an unbounded Levenberg-Marquardt fit with the analytic
+Jacobian of the model converges in a few iterations; only a fit that ends out
+of bounds (negative rate or decline, b outside B_BOUNDS) is redone with the
+slower bounded solver.
+
+Output, one row per well:
+
+    WELL, MODEL, QI, DI, B, RMSE, POINTS, EUR, ERROR
+
+Usage:
+    python decline_batch.py advanced_production_data.csv --column OIL_RATE --output decline_fits.csv --workers 8
+'''
+import argparse
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import OptimizeWarning, curve_fit
+
+from decline import DAYS_PER_MONTH, EUR_MONTHS, MIN_POINTS, arps_eur, fit_declines
+
+GUESS_COLUMNS = ('INITIAL_RATE', 'DECLINE_RATE', 'B_FACTOR')
+RESULT_COLUMNS = ['WELL', 'MODEL', 'QI', 'DI', 'B', 'RMSE', 'POINTS', 'EUR', 'ERROR']
+
+# Wells per task sent to a worker process
+CHUNK_SIZE = 64
+
+# Range of the hyperbolic b factor
+B_BOUNDS = (1e-3, 2.0)
+
+
+# Decline curve models, as in learning_basic.ipynb
+def exponential_decline(t, qi, di):
+    return qi * np.exp(-di * t)
+
+
+def hyperbolic_decline(t, qi, di, b):
+    return qi / (1 + b * di * t) ** (1 / b)
+
+
+def harmonic_decline(t, qi, di):
+    return qi / (1 + di * t)
+
+
+# Their derivatives with respect to each parameter, one column per parameter
+def exponential_jacobian(t, qi, di):
+    rate = np.exp(-di * t)
+    return np.column_stack([rate, -qi * t * rate])
+
+
+def hyperbolic_jacobian(t, qi, di, b):
+    base = 1 + b * di * t
+    rate = base ** (-1 / b)
+    return np.column_stack([rate, -qi * t * rate / base,
+                            qi * rate * (np.log(base) / b ** 2 - di * t / (b * base))])
+
+
+def harmonic_jacobian(t, qi, di):
+    base = 1 + di * t
+    return np.column_stack([1 / base, -qi * t / base ** 2])
+
+
+# Model name -> (function, jacobian, b of the model, None when fitted)
+MODELS = {
+    'exponential': (exponential_decline, exponential_jacobian, 0.0),
+    'hyperbolic': (hyperbolic_decline, hyperbolic_jacobian, None),
+    'harmonic': (harmonic_decline, harmonic_jacobian, 1.0),
+}
+
+
+def well_series(frame, column='OIL_RATE', key='WELL', date='DATE'):
+    '''[(well, t in months, rates, (qi, di, b) warm start)] of every well, in order of appearance.'''
+    frame = frame[frame[key].notna()]
+    codes, wells = pd.factorize(frame[key].to_numpy())
+    dates = pd.to_datetime(frame[date]).to_numpy()
+    first = pd.Series(dates).groupby(codes).min().to_numpy()
+    t = (dates - first[codes]) / np.timedelta64(1, 'D') / DAYS_PER_MONTH
+    q = frame[column].to_numpy(dtype=float)
+
+    # Warm starts: the per-well parameters of the table, else the linearized fit of all wells
+    qi, di, b, _, _ = fit_declines(t, q, codes, len(wells))
+    if all(name in frame.columns for name in GUESS_COLUMNS):
+        guesses = frame[list(GUESS_COLUMNS)].groupby(codes).first().to_numpy(dtype=float)
+        given = np.isfinite(guesses).all(axis=1)
+        qi, di, b = (np.where(given, guesses[:, i], value) for i, value in enumerate((qi, di, b)))
+
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(wells) + 1))
+    series = []
+    for code, well in enumerate(wells):
+        rows = order[bounds[code]:bounds[code + 1]]
+        rows = rows[np.argsort(t[rows], kind='stable')]
+        series.append((well, t[rows], q[rows], (qi[code], di[code], b[code])))
+    return series
+
+
+def fit_well(well, t, q, guess, models=tuple(MODELS), eur_months=EUR_MONTHS, limit=0.0):
+    '''Fit the models to one well from a warm start; return the row of the best one.'''
+    valid = np.isfinite(t) & np.isfinite(q) & (q > 0)
+    t, q = t[valid], q[valid]
+    result = dict.fromkeys(RESULT_COLUMNS)
+    result.update(WELL=well, POINTS=len(q))
+    if len(q) < MIN_POINTS:
+        result['ERROR'] = f'{len(q)} points'
+        return result
+
+    # A start inside the bounds; the first rate and a 5% monthly decline when there is none
+    qi, di, b = guess
+    qi = qi if np.isfinite(qi) and qi > 0 else q[0]
+    di = di if np.isfinite(di) and di > 0 else 0.05
+    b = float(np.clip(b if np.isfinite(b) else 0.5, *B_BOUNDS))
+
+    best_sse, errors = np.inf, []
+    for name in models:
+        function, jacobian, model_b = MODELS[name]
+        if model_b is None:
+            p0, bounds = [qi, di, b], ([0, 0, B_BOUNDS[0]], [np.inf, np.inf, B_BOUNDS[1]])
+        else:
+            p0, bounds = [qi, di], ([0, 0], [np.inf, np.inf])
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', OptimizeWarning)
+                with np.errstate(all='ignore'):
+                    try:
+                        params, _ = curve_fit(function, t, q, p0=p0, jac=jacobian, method='lm', maxfev=5000)
+                        inside = np.all((params >= bounds[0]) & (params <= bounds[1]))
+                    except RuntimeError:
+                        inside = False
+                    if not inside:
+                        params, _ = curve_fit(function, t, q, p0=p0, jac=jacobian, bounds=bounds, maxfev=5000)
+                    residual = q - function(t, *params)
+        except (RuntimeError, ValueError) as e:
+            errors.append(f'{name}: {e}')
+            continue
+        sse = float(np.dot(residual, residual))
+        if np.isfinite(sse) and sse < best_sse:
+            best_sse = sse
+            fitted_b = params[2] if model_b is None else model_b
+            result.update(MODEL=name, QI=params[0], DI=params[1], B=fitted_b)
+
+    if result['MODEL'] is None:
+        result['ERROR'] = '; '.join(errors)
+        return result
+    result['RMSE'] = np.sqrt(best_sse / len(q))
+    result['EUR'] = float(arps_eur(result['QI'], result['DI'], result['B'], eur_months, limit))
+    return result
+
+
+def fit_chunk(chunk, models=tuple(MODELS), eur_months=EUR_MONTHS, limit=0.0):
+    return [fit_well(*series, models=models, eur_months=eur_months, limit=limit) for series in chunk]
+
+
+def fit_wells(frame, column='OIL_RATE', key='WELL', date='DATE', models=tuple(MODELS), workers=None,
+              eur_months=EUR_MONTHS, limit=0.0, chunk_size=CHUNK_SIZE, report=print):
+    '''Fit every well of a production table on a process pool; return one row per well.
+
+    workers=1 fits in this process. Wells that cannot be fitted have an ERROR and no MODEL.
+    '''
+    start = time.perf_counter()
+    series = well_series(frame, column, key, date)
+    chunks = [series[i:i + chunk_size] for i in range(0, len(series), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        rows = [row for chunk in chunks for row in fit_chunk(chunk, models, eur_months, limit)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(partial(fit_chunk, models=models, eur_months=eur_months, limit=limit), chunks)
+            rows = [row for chunk in results for row in chunk]
+
+    fits = pd.DataFrame(rows, columns=RESULT_COLUMNS).rename(columns={'WELL': key})
+    if report:
+        failed = int(fits['MODEL'].isna().sum())
+        report(f'{len(fits) - failed} wells fitted, {failed} failed in {time.perf_counter() - start:.2f} s')
+    return fits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit Arps decline curves to every well of a production table.')
+    parser.add_argument('production', help='production CSV (WELL, DATE and rate columns)')
+    parser.add_argument('--column', default='OIL_RATE', help='rate column to fit')
+    parser.add_argument('--output', default='decline_fits.csv')
+    parser.add_argument('--models', default=','.join(MODELS), help='comma separated models to try')
+    parser.add_argument('--eur-months', type=float, default=EUR_MONTHS, help='EUR horizon in months')
+    parser.add_argument('--limit', type=float, default=0.0, help='economic limit rate for the EUR')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    fits = fit_wells(pd.read_csv(args.production), args.column, models=tuple(args.models.split(',')),
+                     workers=args.workers, eur_months=args.eur_months, limit=args.limit)
+    fits.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
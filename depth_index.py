@@ -0,0 +1,135 @@
+'''
+Depth-indexed container for well log curves.
+
+Depth ranges are resolved to a row slice instead of scanning the whole log
+with a boolean mask: by step arithmetic in O(1) when the depth column is
+regularly sampled (the usual STEP of a LAS file), by binary search otherwise.
+Windows are plain slices of the curve arrays, so they are views and nothing
+is copied.
+
+Example:
+    logs = DepthIndexedLogs.from_frame(data, depth='DEPT')
+    zone = logs.window(2960, 3340)      # views on every curve
+    zone['GR'].mean()
+    data.iloc[logs.slice(2960, 3340)]   # same rows as the boolean mask, without the scan
+'''
+import math
+
+import numpy as np
+
+# Relative tolerance on the step for the depth column to count as regular
+STEP_TOLERANCE = 1e-6
+
+
+class DepthIndexedLogs:
+    '''Curves sharing one increasing depth column.'''
+
+    def __init__(self, depth, curves, step=None):
+        depth = np.asarray(depth)
+        if depth.ndim != 1:
+            raise ValueError('depth must be one-dimensional')
+        if depth.size and not np.isfinite(depth).all():
+            raise ValueError('depth must not contain NaN or infinite values')
+        if depth.size > 1 and (np.diff(depth) <= 0).any():
+            raise ValueError('depth must be strictly increasing')
+        curves = {name: np.asarray(values) for name, values in curves.items()}
+        for name, values in curves.items():
+            if values.shape[0] != depth.shape[0]:
+                raise ValueError(f'curve {name} has {values.shape[0]} samples for {depth.shape[0]} depths')
+
+        self.depth = depth
+        self.curves = curves
+        self.step = self._regular_step(depth, step)
+
+    @staticmethod
+    def _regular_step(depth, step):
+        '''The sampling step if every depth is on it, else None.'''
+        if depth.size < 2:
+            return None
+        if step is None:
+            step = float(depth[1] - depth[0])
+        step = abs(float(step))
+        if step == 0:
+            return None
+        expected = depth[0] + step * np.arange(depth.size)
+        if np.allclose(depth, expected, rtol=0, atol=step * STEP_TOLERANCE + abs(depth[-1]) * 1e-7):
+            return step
+        return None
+
+    @classmethod
+    def from_frame(cls, frame, depth='DEPT', step=None):
+        '''Index the columns of a DataFrame on one of them (or on the index if depth is None).'''
+        depth_values = frame.index.to_numpy() if depth is None else frame[depth].to_numpy()
+        return cls(depth_values, {name: frame[name].to_numpy() for name in frame.columns}, step)
+
+    @classmethod
+    def from_cache(cls, base, depth=None):
+        '''Index a columnar cache written by lastotext.py; the first curve is the depth by default.'''
+        from log_cache import load_log_cache
+
+        meta, curves = load_log_cache(base)
+        depth = depth or meta['curves'][0]['name']
+        return cls(curves[depth], curves, meta['depth']['step'])
+
+    def __len__(self):
+        return self.depth.shape[0]
+
+    def __contains__(self, name):
+        return name in self.curves
+
+    def __getitem__(self, name):
+        return self.curves[name]
+
+    @property
+    def top(self):
+        return self.depth[0]
+
+    @property
+    def bottom(self):
+        return self.depth[-1]
+
+    def index_range(self, top, bottom):
+        '''(start, stop) row indices of the samples with top <= depth <= bottom.'''
+        n = self.depth.shape[0]
+        if n == 0 or bottom < top:
+            return 0, 0
+        if self.step is not None:
+            start_depth, eps = float(self.depth[0]), STEP_TOLERANCE
+            start = math.ceil((top - start_depth) / self.step - eps)
+            stop = math.floor((bottom - start_depth) / self.step + eps) + 1
+            start, stop = min(max(start, 0), n), min(max(stop, 0), n)
+        else:
+            start = int(np.searchsorted(self.depth, top, side='left'))
+            stop = int(np.searchsorted(self.depth, bottom, side='right'))
+        return start, max(start, stop)
+
+    def slice(self, top, bottom):
+        '''A row slice for top <= depth <= bottom, usable on any array or DataFrame.iloc.'''
+        return slice(*self.index_range(top, bottom))
+
+    def nearest(self, depth):
+        '''Row index of the sample closest to a depth.'''
+        n = self.depth.shape[0]
+        if n == 0:
+            raise IndexError('empty log')
+        if self.step is not None:
+            return min(max(int(round((depth - float(self.depth[0])) / self.step)), 0), n - 1)
+        i = int(np.searchsorted(self.depth, depth))
+        if i == 0 or (i < n and self.depth[i] - depth < depth - self.depth[i - 1]):
+            return min(i, n - 1)
+        return i - 1
+
+    def window(self, top, bottom, curves=None):
+        '''A DepthIndexedLogs over top <= depth <= bottom whose curves are views on these.'''
+        rows = self.slice(top, bottom)
+        names = self.curves if curves is None else curves
+        window = DepthIndexedLogs.__new__(DepthIndexedLogs)
+        window.depth = self.depth[rows]
+        window.curves = {name: self.curves[name][rows] for name in names}
+        window.step = self.step if window.depth.size > 1 else None
+        return window
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.curves)
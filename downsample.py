@@ -0,0 +1,106 @@
+'''
+Downsampling of long traces to what a graph can show.
+
+A line chart W pixels wide cannot show more than about two values per pixel
+column, so traces are reduced to a number of points proportional to the pixel
+size before they are sent to the browser:
+- minmax_indices keeps the minimum and the maximum of every bucket, so spikes
+  and gaps survive (used for well logs);
+- lttb_indices is Largest-Triangle-Three-Buckets, which keeps the visual
+  shape of a line with one point per bucket (used for production rates).
+Both return row indices, so any columns can be taken at the same rows.
+
+When the user zooms, the visible range comes back in the graph relayoutData;
+axis_range() reads it so that the callback can downsample the zoomed window
+only, which gives full resolution once the window is small enough.
+'''
+import numpy as np
+
+# Points per pixel kept for a trace, and the pixel size used before the browser reports one
+POINTS_PER_PIXEL = 2
+DEFAULT_PIXELS = 800
+
+
+def target_points(pixels):
+    return max(int(pixels or DEFAULT_PIXELS) * POINTS_PER_PIXEL, 3)
+
+
+def minmax_indices(y, buckets):
+    '''Sorted indices of the minimum and maximum of every bucket (NaN values are never picked
+    unless a bucket has nothing else); every index when the trace is short enough.'''
+    y = np.asarray(y, dtype=float)
+    n = y.shape[0]
+    if n <= 2 * buckets:
+        return np.arange(n)
+    size = -(-n // buckets)
+    padded = np.full(size * buckets, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    low = np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    high = np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    offsets = np.arange(buckets) * size
+    indices = np.unique(np.concatenate([offsets + low, offsets + high, [0, n - 1]]))
+    return indices[indices < n]
+
+
+def lttb_indices(x, y, points):
+    '''Indices of the points kept by Largest-Triangle-Three-Buckets (first and last always kept).
+
+    x must be increasing (numbers or datetime64); NaN values of y are skipped.
+    '''
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype(float)
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(~np.isnan(y))
+    if valid.shape[0] <= points:
+        return valid
+    x, y = x[valid], y[valid]
+    n = valid.shape[0]
+
+    # Buckets of the inner points; every bucket picks the point that makes the largest
+    # triangle with the point kept in the previous bucket and the mean of the next one
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    sums_x, sums_y = np.add.reduceat(x[1:n - 1], edges[:-1] - 1), np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])[1:]
+    mean_y = np.append(sums_y / counts, y[-1])[1:]
+
+    kept = np.empty(points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        area = np.abs((x[previous] - mean_x[bucket]) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (mean_y[bucket] - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return valid[kept]
+
+
+def axis_range(relayout, axis='xaxis'):
+    '''(low, high) of an axis zoomed by the user from a graph relayoutData, None when autoranged.'''
+    if not relayout or relayout.get(f'{axis}.autorange'):
+        return None
+    if f'{axis}.range[0]' in relayout and f'{axis}.range[1]' in relayout:
+        bounds = relayout[f'{axis}.range[0]'], relayout[f'{axis}.range[1]']
+    elif f'{axis}.range' in relayout:
+        bounds = tuple(relayout[f'{axis}.range'])
+    else:
+        return None
+    return min(bounds), max(bounds)
+
+
+def window_rows(values, bounds):
+    '''Row slice of increasing values inside bounds (from axis_range), plus one row on each
+    side so the line reaches the edges of the view; every row when bounds is None.'''
+    if bounds is None:
+        return slice(None)
+    values = np.asarray(values)
+    low, high = bounds
+    if np.issubdtype(values.dtype, np.datetime64):
+        low, high = np.datetime64(low), np.datetime64(high)
+    start = int(np.searchsorted(values, low, side='left'))
+    stop = int(np.searchsorted(values, high, side='right'))
+    return slice(max(start - 1, 0), min(stop + 1, values.shape[0]))
@@ -0,0 +1,98 @@
+'''
+Bounded LRU cache for Plotly figures built by the dashboard callbacks.
+
+Figures are keyed by the callback inputs (e.g. well, start date, end date,
+production type, theme). The cache holds at most max_entries figures and at
+most max_bytes of them, measured as the size of their JSON serialization (what
+Dash sends to the browser); the least recently used figures are evicted first.
+Call clear() whenever the underlying data is reloaded.
+
+Example:
+    figures = FigureCache(max_entries=256, max_bytes=64 * 1024 * 1024)
+    fig = figures.get_or_build(('production', well, start, end, kind, theme),
+                               lambda: production_figure(...))
+    figures.stats()   # {'hits': ..., 'misses': ..., 'evictions': ..., ...}
+'''
+import json
+import threading
+from collections import OrderedDict
+
+from plotly.utils import PlotlyJSONEncoder
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def figure_size(figure):
+    '''Approximate size of a figure (or a tuple of figures) in bytes: its JSON length.'''
+    if isinstance(figure, (tuple, list)):
+        return sum(figure_size(f) for f in figure)
+    return len(json.dumps(figure, cls=PlotlyJSONEncoder))
+
+
+class FigureCache:
+    '''Thread-safe LRU cache of figures with an entry and a memory limit.'''
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (figure, size), least recently used first
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, figure):
+        '''Store a figure; one larger than max_bytes on its own is not cached.'''
+        size = figure_size(figure)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return figure
+            self._entries[key] = (figure, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return figure
+
+    def get_or_build(self, key, build):
+        '''The cached figure for key, else build() it and cache the result.'''
+        missing = object()
+        figure = self.get(key, missing)
+        if figure is missing:
+            figure = self.put(key, build())
+        return figure
+
+    def clear(self):
+        '''Drop every figure (after a data reload); the counters are kept.'''
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'bytes': self.bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
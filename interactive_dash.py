@@ -8,8 +8,15 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import warnings
+from collections import namedtuple
 warnings.filterwarnings('ignore')
 
+from decline import DeclineFits, model_name
+from figure_cache import FigureCache
+from lazy_data import LazyValue, preload
+from production_store import ProductionStore
+from well_aggregates import WellAggregates
+
 # Create sample data for the dashboard (in a real scenario, you would load from databases/APIs)
 def create_dashboard_data():
     # Production data
@@ -19,7 +26,7 @@ def create_dashboard_data():
         'Oil_Production': np.random.lognormal(7.5, 0.3, len(dates)) * 1000,
         'Water_Production': np.random.lognormal(7.2, 0.4, len(dates)) * 1000,
         'Gas_Production': np.random.lognormal(7.0, 0.35, len(dates)) * 10000,
-        'Field': ['Field_A'] * 24 + ['Field_B'] * 24 + ['Field_C'] * 24
+        'Field': np.repeat(['Field_A', 'Field_B', 'Field_C'], -(-len(dates) // 3))[:len(dates)]
     })
     
     # Well performance data
@@ -53,109 +60,149 @@ def create_dashboard_data():
     
     return production_data, well_data, economic_data, reservoir_data
 
-# Create the data
-production_data, well_data, economic_data, reservoir_data = create_dashboard_data()
+DashboardData = namedtuple('DashboardData', ['version', 'production', 'well', 'economic', 'reservoir',
+                                             'production_store', 'well_aggregates', 'production_declines'])
+
+PRODUCTION_COLUMNS = ['Oil_Production', 'Water_Production', 'Gas_Production']
+
+def build_data(version=0):
+    production_data, well_data, economic_data, reservoir_data = create_dashboard_data()
+    return DashboardData(version, production_data, well_data, economic_data, reservoir_data,
+                         ProductionStore(production_data, key='Field', date='Date'),
+                         WellAggregates(well_data, ['Production', 'Water_Cut', 'GOR'], key='Well', date='Date'),
+                         DeclineFits(production_data, PRODUCTION_COLUMNS, key='Field', date='Date'))
+
+# The data is created on first use (or at import in preload mode), not when the module is imported
+dashboard_data = LazyValue(build_data)
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
 server = app.server
 
-# Define the layout of the dashboard
-app.layout = html.Div([
-    html.H1("Petroleum Engineering Analytics Dashboard", 
-            style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': 30}),
+# Figures already served, keyed by the callback inputs and the data version; cleared when the data is reloaded
+figure_cache = FigureCache()
+
+def reload_data():
+    '''Recreate the dashboard data as a new version and drop the figures built from the previous data.'''
+    version = dashboard_data.get().version + 1 if dashboard_data.loaded else 0
+    dashboard_data.set(build_data(version))
+    figure_cache.clear()
+
+@server.route('/figure-cache')
+def figure_cache_stats():
+    return dict(figure_cache.stats(), data_loaded=dashboard_data.loaded,
+                data_version=dashboard_data.get().version if dashboard_data.loaded else None)
+
+# Define the layout of the dashboard; a function, so that the data is only needed once a page is served
+def serve_layout():
+    production_data = dashboard_data.get().production
+    return html.Div([
+        html.H1("Petroleum Engineering Analytics Dashboard", 
+                style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': 30}),
     
-    # Filters and controls
-    html.Div([
+        # Filters and controls
         html.Div([
-            html.Label("Select Field:", style={'fontWeight': 'bold'}),
-            dcc.Dropdown(
-                id='field-selector',
-                options=[{'label': field, 'value': field} for field in production_data['Field'].unique()],
-                value='Field_A',
-                clearable=False
-            )
-        ], style={'width': '24%', 'display': 'inline-block', 'marginRight': '1%'}),
+            html.Div([
+                html.Label("Select Field:", style={'fontWeight': 'bold'}),
+                dcc.Dropdown(
+                    id='field-selector',
+                    options=[{'label': field, 'value': field} for field in production_data['Field'].unique()],
+                    value='Field_A',
+                    clearable=False
+                )
+            ], style={'width': '24%', 'display': 'inline-block', 'marginRight': '1%'}),
         
-        html.Div([
-            html.Label("Date Range:", style={'fontWeight': 'bold'}),
-            dcc.DatePickerRange(
-                id='date-range',
-                start_date=production_data['Date'].min(),
-                end_date=production_data['Date'].max(),
-                display_format='YYYY-MM-DD'
-            )
-        ], style={'width': '32%', 'display': 'inline-block', 'marginRight': '1%'}),
+            html.Div([
+                html.Label("Date Range:", style={'fontWeight': 'bold'}),
+                dcc.DatePickerRange(
+                    id='date-range',
+                    start_date=production_data['Date'].min(),
+                    end_date=production_data['Date'].max(),
+                    display_format='YYYY-MM-DD'
+                )
+            ], style={'width': '32%', 'display': 'inline-block', 'marginRight': '1%'}),
         
-        html.Div([
-            html.Label("Production Type:", style={'fontWeight': 'bold'}),
-            dcc.Dropdown(
-                id='production-type',
-                options=[
-                    {'label': 'Oil', 'value': 'Oil_Production'},
-                    {'label': 'Water', 'value': 'Water_Production'},
-                    {'label': 'Gas', 'value': 'Gas_Production'}
-                ],
-                value='Oil_Production',
-                clearable=False
-            )
-        ], style={'width': '24%', 'display': 'inline-block', 'marginRight': '1%'}),
+            html.Div([
+                html.Label("Production Type:", style={'fontWeight': 'bold'}),
+                dcc.Dropdown(
+                    id='production-type',
+                    options=[
+                        {'label': 'Oil', 'value': 'Oil_Production'},
+                        {'label': 'Water', 'value': 'Water_Production'},
+                        {'label': 'Gas', 'value': 'Gas_Production'}
+                    ],
+                    value='Oil_Production',
+                    clearable=False
+                )
+            ], style={'width': '24%', 'display': 'inline-block', 'marginRight': '1%'}),
         
-        html.Div([
-            html.Label("Chart Theme:", style={'fontWeight': 'bold'}),
-            dcc.Dropdown(
-                id='theme-selector',
-                options=[
-                    {'label': 'Plotly White', 'value': 'plotly_white'},
-                    {'label': 'Plotly Dark', 'value': 'plotly_dark'},
-                    {'label': 'GGPlot2', 'value': 'ggplot2'}
-                ],
-                value='plotly_white',
-                clearable=False
-            )
-        ], style={'width': '18%', 'display': 'inline-block'}),
-    ], style={'marginBottom': 30, 'padding': 10, 'borderRadius': 5, 'backgroundColor': '#f8f9fa'}),
+            html.Div([
+                html.Label("Chart Theme:", style={'fontWeight': 'bold'}),
+                dcc.Dropdown(
+                    id='theme-selector',
+                    options=[
+                        {'label': 'Plotly White', 'value': 'plotly_white'},
+                        {'label': 'Plotly Dark', 'value': 'plotly_dark'},
+                        {'label': 'GGPlot2', 'value': 'ggplot2'}
+                    ],
+                    value='plotly_white',
+                    clearable=False
+                )
+            ], style={'width': '18%', 'display': 'inline-block'}),
+        ], style={'marginBottom': 30, 'padding': 10, 'borderRadius': 5, 'backgroundColor': '#f8f9fa'}),
     
-    # First row of charts
-    html.Div([
+        # First row of charts
         html.Div([
-            dcc.Graph(id='production-trend-chart')
-        ], style={'width': '49%', 'display': 'inline-block'}),
+            html.Div([
+                dcc.Graph(id='production-trend-chart')
+            ], style={'width': '49%', 'display': 'inline-block'}),
         
-        html.Div([
-            dcc.Graph(id='economic-analysis-chart')
-        ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'}),
-    ]),
+            html.Div([
+                dcc.Graph(id='economic-analysis-chart')
+            ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'}),
+        ]),
     
-    # Second row of charts
-    html.Div([
+        # Second row of charts
         html.Div([
-            dcc.Graph(id='reservoir-properties-chart')
-        ], style={'width': '32%', 'display': 'inline-block'}),
+            html.Div([
+                dcc.Graph(id='reservoir-properties-chart')
+            ], style={'width': '32%', 'display': 'inline-block'}),
         
-        html.Div([
-            dcc.Graph(id='well-performance-chart')
-        ], style={'width': '32%', 'display': 'inline-block', 'marginLeft': '2%'}),
+            html.Div([
+                dcc.Graph(id='well-performance-chart')
+            ], style={'width': '32%', 'display': 'inline-block', 'marginLeft': '2%'}),
         
-        html.Div([
-            dcc.Graph(id='forecast-chart')
-        ], style={'width': '32%', 'display': 'inline-block', 'marginLeft': '2%'}),
-    ], style={'marginTop': 20}),
+            html.Div([
+                dcc.Graph(id='forecast-chart')
+            ], style={'width': '32%', 'display': 'inline-block', 'marginLeft': '2%'}),
+        ], style={'marginTop': 20}),
     
-    # Third row of charts
-    html.Div([
+        # Third row of charts
         html.Div([
-            dcc.Graph(id='risk-analysis-chart')
-        ], style={'width': '49%', 'display': 'inline-block'}),
+            html.Div([
+                dcc.Graph(id='risk-analysis-chart')
+            ], style={'width': '49%', 'display': 'inline-block'}),
         
-        html.Div([
-            dcc.Graph(id='performance-metrics-chart')
-        ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'}),
-    ], style={'marginTop': 20}),
+            html.Div([
+                dcc.Graph(id='performance-metrics-chart')
+            ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'}),
+        ], style={'marginTop': 20}),
     
-    # Hidden div to store intermediate values
-    html.Div(id='intermediate-data', style={'display': 'none'})
-])
+        # Hidden div to store intermediate values
+        html.Div(id='intermediate-data', style={'display': 'none'})
+    ])
+
+# Components of the callbacks, for validating them before the layout is first served
+app.validation_layout = html.Div([
+    dcc.Dropdown(id='field-selector'),
+    dcc.DatePickerRange(id='date-range'),
+    dcc.Dropdown(id='production-type'),
+    dcc.Dropdown(id='theme-selector')
+] + [dcc.Graph(id=chart) for chart in ['production-trend-chart', 'economic-analysis-chart',
+                                       'reservoir-properties-chart', 'well-performance-chart',
+                                       'forecast-chart', 'risk-analysis-chart',
+                                       'performance-metrics-chart']])
+app.layout = serve_layout
 
 # Callback to update all charts based on user input
 @app.callback(
@@ -173,12 +220,15 @@ app.layout = html.Div([
      Input('theme-selector', 'value')]
 )
 def update_dashboard(selected_field, start_date, end_date, production_type, theme):
+    # A build still running on the previous data caches its figures under the previous version
+    data = dashboard_data.get()
+    key = (data.version, selected_field, start_date, end_date, production_type, theme)
+    return figure_cache.get_or_build(
+        key, lambda: build_figures(data, selected_field, start_date, end_date, production_type, theme))
+
+def build_figures(data, selected_field, start_date, end_date, production_type, theme):
     # Filter data based on user selection
-    filtered_production = production_data[
-        (production_data['Field'] == selected_field) & 
-        (production_data['Date'] >= start_date) & 
-        (production_data['Date'] <= end_date)
-    ]
+    filtered_production = data.production_store.select(selected_field, start_date, end_date)
     
     # 1. Production Trend Chart
     production_fig = px.line(
@@ -196,7 +246,7 @@ def update_dashboard(selected_field, start_date, end_date, production_type, them
     
     # 2. Economic Analysis Chart
     economic_fig = px.bar(
-        economic_data,
+        data.economic,
         x='Scenario',
         y='NPV_MM',
         title='Economic Analysis by Scenario',
@@ -211,7 +261,7 @@ def update_dashboard(selected_field, start_date, end_date, production_type, them
     
     # 3. Reservoir Properties Chart
     reservoir_fig = px.scatter(
-        reservoir_data,
+        data.reservoir,
         x='X',
         y='Y',
         color='Porosity',
@@ -227,7 +277,7 @@ def update_dashboard(selected_field, start_date, end_date, production_type, them
     
     # 4. Well Performance Chart
     well_fig = px.box(
-        well_data,
+        data.well,
         x='Well',
         y='Production',
         title='Well Production Distribution',
@@ -240,39 +290,26 @@ def update_dashboard(selected_field, start_date, end_date, production_type, them
     )
     
     # 5. Forecast Chart
-    # Create a simple forecast based on historical data
+    # Evaluate the decline curve fitted to the field when the data was created
     forecast_dates = pd.date_range(
         start=filtered_production['Date'].max() + timedelta(days=30),
         periods=12,
         freq='M'
     )
+    forecast_values = data.production_declines.forecast(selected_field, production_type, forecast_dates)
     
-    last_value = filtered_production[production_type].iloc[-1]
-    forecast_values = [last_value * (0.97 ** i) for i in range(12)]
-    
-    forecast_df = pd.DataFrame({
-        'Date': forecast_dates,
-        'Production': forecast_values,
-        'Type': ['Forecast'] * 12
-    })
-    
-    historical_df = pd.DataFrame({
-        'Date': filtered_production['Date'],
-        'Production': filtered_production[production_type],
-        'Type': ['Historical'] * len(filtered_production)
-    })
-    
-    combined_df = pd.concat([historical_df, forecast_df])
-    
-    forecast_fig = px.line(
-        combined_df,
-        x='Date',
-        y='Production',
-        color='Type',
-        title='Production Forecast',
-        template=theme
-    )
+    forecast_fig = go.Figure()
+    forecast_fig.add_trace(go.Scatter(x=filtered_production['Date'], y=filtered_production[production_type],
+                                      mode='lines', name='Historical'))
+    title = 'Production Forecast'
+    if forecast_values is not None:
+        forecast_fig.add_trace(go.Scatter(x=forecast_dates, y=forecast_values, mode='lines', name='Forecast'))
+        b = data.production_declines.fitted(selected_field, production_type)[2]
+        title = f'Production Forecast ({model_name(b)} decline, b={b:g})'
     forecast_fig.update_layout(
+        title=title,
+        template=theme,
+        legend_title_text='Type',
         xaxis_title="Date",
         yaxis_title="Production (bbl/day)"
     )
@@ -281,8 +318,8 @@ def update_dashboard(selected_field, start_date, end_date, production_type, them
     risk_fig = go.Figure()
     
     risk_fig.add_trace(go.Scatterpolar(
-        r=economic_data['Risk_Score'],
-        theta=economic_data['Scenario'],
+        r=data.economic['Risk_Score'],
+        theta=data.economic['Scenario'],
         fill='toself',
         name='Risk Score'
     ))
@@ -299,11 +336,8 @@ def update_dashboard(selected_field, start_date, end_date, production_type, them
     )
     
     # 7. Performance Metrics Chart
-    metrics_data = well_data.groupby('Well').agg({
-        'Production': 'mean',
-        'Water_Cut': 'mean',
-        'GOR': 'mean'
-    }).reset_index()
+    # Per-well means from the running aggregates instead of a groupby over every row
+    metrics_data = data.well_aggregates.means()
     
     metrics_fig = px.scatter_matrix(
         metrics_data,
@@ -316,6 +350,9 @@ def update_dashboard(selected_field, start_date, end_date, production_type, them
     
     return production_fig, economic_fig, reservoir_fig, well_fig, forecast_fig, risk_fig, metrics_fig
 
+# In preload mode, create the data now so that forked workers share it
+preload(dashboard_data)
+
 # Run the app
 if __name__ == '__main__':
     app.run_server(debug=True, port=8050)
\ No newline at end of file
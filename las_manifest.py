@@ -0,0 +1,109 @@
+'''
+Manifest of converted LAS files for incremental re-conversion.
+
+For every output the manifest records content hashes of the LAS file that
+produced it, split so that a change can be classified:
+- data: the bytes of the ~A block;
+- layout: the curves of the ~C section and the NULL value, which decide how
+  the data block is decoded;
+- header: all the bytes before ~A (~V, ~W, ~C, ~P, ~O).
+together with the converter settings used (output format, float32 precision,
+cache format version).
+
+plan() compares a fresh fingerprint with the recorded entry:
+- 'unchanged': nothing to do;
+- 'metadata': only ~W/~P/... changed, the metadata sidecar is rewritten and the
+  data block is left alone;
+- 'convert': anything else.
+
+When size and modification time match the entry, the recorded hashes are
+reused instead of reading the file again.
+'''
+import hashlib
+import json
+import os
+
+from las_reader import read_header
+
+MANIFEST_NAME = 'lastotext_manifest.json'
+MANIFEST_VERSION = 1
+HASH_BLOCK = 1 << 20
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def fingerprint(lasfile, previous=None):
+    '''Hashes of the header, layout and data of a LAS file.
+
+    If previous (a manifest entry) has the same size and mtime, its hashes
+    are returned without reading the file.
+    '''
+    stat = os.stat(lasfile)
+    if previous is not None and previous.get('size') == stat.st_size \
+            and previous.get('mtime_ns') == stat.st_mtime_ns:
+        return {key: previous[key] for key in ('size', 'mtime_ns', 'header', 'layout', 'data')}
+
+    header = read_header(lasfile)
+    if header.data_offset is None:
+        raise ValueError(f'{lasfile}: no ~A section found')
+
+    data_hash = hashlib.sha256()
+    with open(lasfile, 'rb') as f:
+        header_bytes = f.read(header.data_offset)
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            data_hash.update(block)
+
+    layout = json.dumps([[list(curve) for curve in header.curves], header.null_value])
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'header': _digest(header_bytes),
+        'layout': _digest(layout.encode('utf-8')),
+        'data': data_hash.hexdigest(),
+    }
+
+
+def plan(entry, current, settings):
+    '''Decide what a conversion has to do: 'unchanged', 'metadata' or 'convert'.'''
+    if entry is None or entry.get('settings') != settings:
+        return 'convert'
+    if entry['data'] != current['data'] or entry['layout'] != current['layout']:
+        return 'convert'
+    if entry['header'] != current['header']:
+        return 'metadata'
+    return 'unchanged'
+
+
+def make_entry(lasfile, current, settings):
+    entry = dict(current)
+    entry['source'] = os.path.abspath(lasfile)
+    entry['settings'] = settings
+    return entry
+
+
+def manifest_path(output_dir=None):
+    return os.path.join(output_dir or '.', MANIFEST_NAME)
+
+
+def load_manifest(path):
+    '''Return {output path: entry}, empty if the manifest does not exist yet.'''
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    root = os.path.dirname(os.path.abspath(path))
+    return {os.path.normpath(os.path.join(root, key)): entry for key, entry in manifest['outputs'].items()}
+
+
+def save_manifest(path, entries):
+    '''Write {output path: entry}; paths are stored relative to the manifest.'''
+    root = os.path.dirname(os.path.abspath(path))
+    outputs = {os.path.relpath(os.path.abspath(key), root): entry for key, entry in sorted(entries.items())}
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'outputs': outputs}, f, indent=1)
+    os.replace(tmp, path)
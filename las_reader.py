@@ -0,0 +1,244 @@
+'''
+Streaming reader for LAS 2.0 well log files.
+
+The sections (~V, ~W, ~C, ~P, ~O and ~A) are found by scanning the file, so
+nothing depends on fixed line numbers. Two ways to get at the ~A block:
+
+- iter_data_chunks() yields it in fixed-size NumPy chunks, so only one chunk
+  is in memory at a time, whatever the file size;
+- read_data() memory-maps the file and parses the whole block into one 2-D
+  float64 array in C, without any per-line Python work.
+
+Example:
+    header = read_header('WA1.LAS')
+    for chunk in iter_data_chunks('WA1.LAS', chunk_rows=4096):
+        ...   # chunk.shape == (rows, len(header.curve_names))
+
+    data = read_data('WA1.LAS')   # shape (7131, 12), NULL values as NaN
+'''
+import mmap
+import warnings
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 65536
+# Size of the mmap windows handed to the C parser by read_data()
+DEFAULT_WINDOW_BYTES = 1 << 24
+
+# One "MNEM.UNIT  VALUE : DESCRIPTION" line of a header section
+HeaderItem = namedtuple('HeaderItem', ['mnemonic', 'unit', 'value', 'description'])
+
+# First letter after "~" -> section name
+SECTIONS = {
+    'V': 'version',
+    'W': 'well',
+    'C': 'curves',
+    'P': 'parameters',
+    'O': 'other',
+    'A': 'data',
+}
+
+
+class LasHeader:
+    '''Everything in a LAS file before the ~A block.'''
+
+    def __init__(self):
+        self.version = OrderedDict()
+        self.well = OrderedDict()
+        self.curves = []
+        self.parameters = OrderedDict()
+        self.other = []
+        # Byte offset of the first line after "~A", used to seek straight to the data
+        self.data_offset = None
+
+    @property
+    def curve_names(self):
+        return [curve.mnemonic for curve in self.curves]
+
+    @property
+    def curve_units(self):
+        return [curve.unit for curve in self.curves]
+
+    @property
+    def null_value(self):
+        item = self.well.get('NULL')
+        return float(item.value) if item is not None and item.value else None
+
+    @property
+    def wrapped(self):
+        item = self.version.get('WRAP')
+        return item is not None and item.value.upper() == 'YES'
+
+    def well_value(self, mnemonic, default=None):
+        item = self.well.get(mnemonic)
+        return item.value if item is not None else default
+
+
+def parse_header_line(line):
+    '''Split a header line into a HeaderItem.
+
+    The mnemonic ends at the first dot, the unit runs from that dot to the
+    first space, and the description follows the last colon.
+    '''
+    mnemonic, _, rest = line.partition('.')
+    if rest.startswith(' '):
+        unit = ''
+    else:
+        unit, _, rest = rest.partition(' ')
+    value, colon, description = rest.rpartition(':')
+    if not colon:
+        value, description = rest, ''
+    return HeaderItem(mnemonic.strip(), unit.strip(), value.strip(), description.strip())
+
+
+def _section_key(line):
+    return SECTIONS.get(line[1:2].upper())
+
+
+def _scan_header(f):
+    '''Read header lines from a binary file object, leaving it positioned at the ~A data.'''
+    header = LasHeader()
+    section = None
+    while True:
+        raw = f.readline()
+        if not raw:
+            break
+        line = raw.decode('latin-1').strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('~'):
+            section = _section_key(line)
+            if section == 'data':
+                header.data_offset = f.tell()
+                break
+            continue
+        if section == 'other':
+            header.other.append(line)
+        elif section == 'curves':
+            header.curves.append(parse_header_line(line))
+        elif section in ('version', 'well', 'parameters'):
+            item = parse_header_line(line)
+            getattr(header, section)[item.mnemonic] = item
+    return header
+
+
+def read_header(lasfile):
+    '''Return the LasHeader of a LAS file without reading the data block.'''
+    with open(lasfile, 'rb') as f:
+        return _scan_header(f)
+
+
+def iter_data_chunks(lasfile, chunk_rows=DEFAULT_CHUNK_ROWS, null_to_nan=True, header=None):
+    '''Yield the ~A block as float64 arrays of at most chunk_rows rows.
+
+    Values are tokenised rather than split per line, so wrapped files
+    (WRAP. YES) come out with the same shape as unwrapped ones. When
+    null_to_nan is set, the header's NULL value is replaced by NaN.
+    '''
+    if chunk_rows < 1:
+        raise ValueError('chunk_rows must be a positive integer')
+
+    with open(lasfile, 'rb') as f:
+        if header is None:
+            header = _scan_header(f)
+        elif header.data_offset is not None:
+            f.seek(header.data_offset)
+        if header.data_offset is None:
+            raise ValueError(f'{lasfile}: no ~A section found')
+
+        ncurves = len(header.curves)
+        if ncurves == 0:
+            raise ValueError(f'{lasfile}: no curves defined in ~C section')
+        null = header.null_value if null_to_nan else None
+
+        chunk_values = chunk_rows * ncurves
+        pending = np.empty(0)
+        lines = []
+        for raw in f:
+            lines.append(raw)
+            if len(lines) < chunk_rows:
+                continue
+            pending = np.concatenate([pending, _tokens(lines)])
+            lines = []
+            while pending.size >= chunk_values:
+                yield _finish(pending[:chunk_values].reshape(chunk_rows, ncurves), null)
+                pending = pending[chunk_values:]
+
+        if lines:
+            pending = np.concatenate([pending, _tokens(lines)])
+        while pending.size >= ncurves:
+            rows = min(chunk_rows, pending.size // ncurves)
+            yield _finish(pending[:rows * ncurves].reshape(rows, ncurves), null)
+            pending = pending[rows * ncurves:]
+        if pending.size:
+            raise ValueError(f'{lasfile}: ~A block ends with an incomplete row '
+                             f'({pending.size} of {ncurves} values)')
+
+
+def _tokens(lines):
+    return np.array(b' '.join(lines).split(), dtype=np.float64)
+
+
+def _finish(chunk, null):
+    if null is not None:
+        chunk[chunk == null] = np.nan
+    return chunk
+
+
+def read_data(lasfile, header=None, null_to_nan=True, window_bytes=DEFAULT_WINDOW_BYTES):
+    '''Parse the whole ~A block into a (rows, curves) float64 array.
+
+    The file is memory-mapped and cut into windows of about window_bytes that
+    end on a line break; each window is parsed by numpy's C text parser, so
+    the only copies are one window and the result. When null_to_nan is set,
+    the header's NULL value is replaced by NaN.
+    '''
+    if header is None:
+        header = read_header(lasfile)
+    if header.data_offset is None:
+        raise ValueError(f'{lasfile}: no ~A section found')
+    ncurves = len(header.curves)
+    if ncurves == 0:
+        raise ValueError(f'{lasfile}: no curves defined in ~C section')
+
+    with open(lasfile, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file: mmap refuses zero-length mappings
+            raise ValueError(f'{lasfile}: empty file')
+        with mm:
+            parts = []
+            start, end = header.data_offset, len(mm)
+            while start < end:
+                stop = min(start + window_bytes, end)
+                if stop < end:
+                    # End the window on a line break; a line longer than the window is kept whole
+                    newline = mm.rfind(b'\n', start, stop)
+                    if newline < 0:
+                        newline = mm.find(b'\n', stop)
+                    stop = newline + 1 if newline >= 0 else end
+                parts.append(_parse_window(mm[start:stop], lasfile))
+                start = stop
+
+    values = parts[0] if len(parts) == 1 else np.concatenate(parts) if parts else np.empty(0)
+    if values.size % ncurves:
+        raise ValueError(f'{lasfile}: ~A block holds {values.size} values, '
+                         f'not a multiple of {ncurves} curves')
+    data = values.reshape(-1, ncurves)
+
+    null = header.null_value if null_to_nan else None
+    if null is not None:
+        data[data == null] = np.nan
+    return data
+
+
+def _parse_window(buf, lasfile):
+    with warnings.catch_warnings():
+        # Older numpy only warns when it meets text that is not a number
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            return np.fromstring(buf, dtype=np.float64, sep=' ')
+        except (DeprecationWarning, ValueError):
+            raise ValueError(f'{lasfile}: non-numeric value in ~A block') from None
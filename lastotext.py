@@ -1,27 +1,271 @@
 '''
-Walakpa1 Well data is available in LAS format.
-In file:
-- curves names are located at the beginning of lines 20 - 31; 
-- log data start at the line 37.
+Convert a LAS file (e.g. the Walakpa1 well, WA1.LAS) to one of:
+- text: a whitespace-delimited table, one line with the curve names, then one
+  line per depth step (WA1.txt);
+- columnar: a binary columnar cache plus a JSON metadata sidecar
+  (WA1.bin + WA1.json, see log_cache.py) that reloads memory-mapped.
+
+The curve names and the start of the log data are found by scanning the LAS
+sections (see las_reader.py), so any LAS 2.0 file can be converted. The text
+output streams the ~A block chunk by chunk with flat memory use.
+
+A directory or a glob pattern converts every LAS file it matches on a process
+pool and reports the time and throughput of each file.
+
+Conversions are incremental: a manifest (see las_manifest.py) records content
+hashes of each input and the settings used. An unchanged LAS file is skipped,
+and in columnar format one where only the header (~W, ~P, ...) changed only
+gets its metadata sidecar rewritten; a text output is converted again.
+
+Usage:
+    python lastotext.py [lasfile] [output] [--format text|columnar]
+    python lastotext.py 'logs/*.las' --output-dir converted --format columnar --workers 8
 '''
-start_curves_names=19
-end_curves_names=31
-start_log_data=36
-
-lasfile='WA1.las'
-txtfile='WA1.txt'
-
-lines = open(lasfile).read().splitlines()
-
-#Read the name of the curves from las and write them in txt file:
-curves=[]
-for line in lines[start_curves_names:end_curves_names]:
-        curves.append(line.split()[0].split('.')[0])
-        header=str(curves).replace("['","").replace("']","").replace("', '"," ")
-f=open(txtfile,'w')
-f.write(header+'\n')
-
-#Then read the log data which starts at line 37 (In Python is 36) and write it in the same .txt file:
-for text in lines[36:]:
-        f.write(str(text).replace("['","").replace("']","")+'\n')
-f.close()
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from las_reader import DEFAULT_CHUNK_ROWS, iter_data_chunks, read_data, read_header
+from las_manifest import MANIFEST_NAME, fingerprint, load_manifest, make_entry, manifest_path, plan, save_manifest
+from log_cache import DEFAULT_DECIMALS, FORMAT_VERSION, cache_paths, refresh_metadata, write_log_cache
+
+lasfile = 'WA1.LAS'
+
+FORMATS = ('text', 'columnar')
+TEXT_FLOAT_FORMAT = '%14.5f'
+
+
+def las_to_text(lasfile, txtfile, chunk_rows=DEFAULT_CHUNK_ROWS):
+    '''Write the text table and return the number of depth steps written.'''
+    header = read_header(lasfile)
+    if header.data_offset is None:
+        raise ValueError(f'{lasfile}: no ~A section found')
+    rows = 0
+
+    with open(txtfile, 'w') as f:
+        # Write the name of the curves as the first line of the txt file:
+        f.write(' '.join(header.curve_names) + '\n')
+
+        # Then the log data, keeping the NULL value as it is in the las file:
+        for chunk in iter_data_chunks(lasfile, chunk_rows=chunk_rows, null_to_nan=False, header=header):
+            np.savetxt(f, chunk, fmt=TEXT_FLOAT_FORMAT, delimiter='')
+            rows += len(chunk)
+
+    return rows
+
+
+def las_to_columnar(lasfile, output):
+    '''Write the columnar cache and return the number of depth steps written.'''
+    header = read_header(lasfile)
+    meta = write_log_cache(output, header, read_data(lasfile, header=header), source=lasfile)
+    return meta['rows']
+
+
+def default_output(lasfile, fmt, output_dir=None):
+    root = os.path.splitext(lasfile)[0]
+    if output_dir is not None:
+        root = os.path.join(output_dir, os.path.basename(root))
+    return root + '.txt' if fmt == 'text' else root
+
+
+def output_files(output, fmt):
+    return [output] if fmt == 'text' else list(cache_paths(output))
+
+
+def outputs_exist(output, fmt):
+    return all(os.path.exists(path) for path in output_files(output, fmt))
+
+
+def is_up_to_date(lasfile, output, fmt):
+    '''True if every output file exists and is newer than the LAS file.'''
+    source_mtime = os.path.getmtime(lasfile)
+    for path in output_files(output, fmt):
+        if not os.path.exists(path) or os.path.getmtime(path) < source_mtime:
+            return False
+    return True
+
+
+def converter_settings(fmt):
+    '''Everything besides the LAS file that decides what the output looks like.'''
+    if fmt == 'columnar':
+        return {'format': fmt, 'decimals': DEFAULT_DECIMALS, 'cache_version': FORMAT_VERSION}
+    return {'format': fmt, 'float_format': TEXT_FLOAT_FORMAT}
+
+
+def convert_file(lasfile, output, fmt='text', chunk_rows=DEFAULT_CHUNK_ROWS, force=False, entry=None):
+    '''Convert one LAS file and return a dict with its status, timing and throughput.
+
+    entry is the manifest entry of the previous conversion to output, if any:
+    an unchanged file is skipped, and a file where only the header changed
+    gets its metadata sidecar rewritten (columnar) or is converted again
+    (text). Without an entry, outputs newer than
+    the input are kept. The new manifest entry is returned in result['entry'].
+
+    Errors are reported in the result rather than raised, so that one bad
+    file does not stop a batch.
+    '''
+    result = {'lasfile': lasfile, 'output': output, 'status': 'converted', 'error': None,
+              'bytes': 0, 'rows': 0, 'seconds': 0.0, 'entry': None}
+    settings = converter_settings(fmt)
+
+    start = time.perf_counter()
+    try:
+        result['bytes'] = os.path.getsize(lasfile)
+        current = fingerprint(lasfile, entry)
+        if force or not outputs_exist(output, fmt):
+            action = 'convert'
+        elif entry is None:
+            action = 'unchanged' if is_up_to_date(lasfile, output, fmt) else 'convert'
+        else:
+            action = plan(entry, current, settings)
+        if action == 'metadata' and fmt != 'columnar':
+            # Only the columnar output keeps the header apart (its .json sidecar): the text file is rewritten
+            action = 'convert'
+
+        if action == 'convert':
+            if fmt == 'columnar':
+                result['rows'] = las_to_columnar(lasfile, output)
+            else:
+                result['rows'] = las_to_text(lasfile, output, chunk_rows=chunk_rows)
+        elif action == 'metadata':
+            result['status'] = 'metadata'
+            refresh_metadata(output, read_header(lasfile), source=lasfile)
+        else:
+            result['status'] = 'skipped'
+        result['entry'] = make_entry(lasfile, current, settings)
+    except (OSError, ValueError) as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def expand_inputs(pattern):
+    '''LAS files in a directory, matching a glob pattern, or a single path.'''
+    if os.path.isdir(pattern):
+        names = os.listdir(pattern)
+        return sorted(os.path.join(pattern, name) for name in names if name.lower().endswith('.las'))
+    if glob.has_magic(pattern):
+        return sorted(glob.glob(pattern, recursive=True))
+    return [pattern]
+
+
+def throughput(result):
+    '''(MB/s, rows/s) of a conversion result, 0 for skipped or instantaneous ones.'''
+    seconds = result['seconds']
+    if not seconds:
+        return 0.0, 0.0
+    return result['bytes'] / 1e6 / seconds, result['rows'] / seconds
+
+
+def format_result(result):
+    name = os.path.basename(result['lasfile'])
+    if result['status'] == 'skipped':
+        return f'{name}: up to date, skipped'
+    if result['status'] == 'metadata':
+        return f'{name}: header changed, metadata updated'
+    if result['status'] == 'failed':
+        return f'{name}: FAILED ({result["error"]})'
+    mb_s, rows_s = throughput(result)
+    return (f'{name}: {result["rows"]} rows, {result["bytes"] / 1e6:.1f} MB in {result["seconds"]:.3f} s '
+            f'({mb_s:.1f} MB/s, {rows_s:,.0f} rows/s)')
+
+
+def convert_batch(lasfiles, output_dir=None, fmt='text', workers=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                  force=False, report=print, manifest=None):
+    '''Convert many LAS files on a process pool; return the list of results.
+
+    Outputs go next to each input, or into output_dir. The manifest of
+    previous conversions (default: lastotext_manifest.json in output_dir or
+    the current directory) is read before and updated after the batch; only
+    this process writes it. report is called with one line per finished file
+    and a final summary (pass None to silence it).
+    '''
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    manifest = manifest or manifest_path(output_dir)
+    entries = load_manifest(manifest)
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for path in lasfiles:
+            output = default_output(path, fmt, output_dir)
+            futures[pool.submit(convert_file, path, output, fmt, chunk_rows, force,
+                                entries.get(os.path.abspath(output)))] = path, output
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # A worker that died (or an error convert_file does not expect) fails its file only,
+                # so that the manifest entries of the others are still saved
+                path, output = futures[future]
+                result = {'lasfile': path, 'output': output, 'status': 'failed', 'error': repr(e),
+                          'bytes': 0, 'rows': 0, 'seconds': 0.0, 'entry': None}
+            results.append(result)
+            if result['entry'] is not None:
+                entries[os.path.abspath(result['output'])] = result['entry']
+            if report:
+                report(format_result(result))
+    save_manifest(manifest, entries)
+    elapsed = time.perf_counter() - start
+
+    if report:
+        converted = [r for r in results if r['status'] == 'converted']
+        total_bytes = sum(r['bytes'] for r in converted)
+        total_rows = sum(r['rows'] for r in converted)
+        counts = {status: sum(r['status'] == status for r in results) for status in ('metadata', 'skipped', 'failed')}
+        rate = f', {total_bytes / 1e6 / elapsed:.1f} MB/s, {total_rows / elapsed:,.0f} rows/s' if elapsed else ''
+        report(f'{len(converted)} converted, {counts["metadata"]} metadata only, {counts["skipped"]} skipped, '
+               f'{counts["failed"]} failed in {elapsed:.2f} s{rate}')
+    return results
+
+
+def convert_single(lasfile, output, fmt='text', chunk_rows=DEFAULT_CHUNK_ROWS, force=False, manifest=None):
+    '''Convert one LAS file in this process, using and updating the manifest.'''
+    manifest = manifest or manifest_path(os.path.dirname(output))
+    entries = load_manifest(manifest)
+    result = convert_file(lasfile, output, fmt, chunk_rows, force, entries.get(os.path.abspath(output)))
+    if result['entry'] is not None:
+        entries[os.path.abspath(output)] = result['entry']
+        save_manifest(manifest, entries)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert LAS files to text tables or columnar caches.')
+    parser.add_argument('lasfile', nargs='?', default=lasfile,
+                        help='a LAS file, a directory of LAS files or a glob pattern')
+    parser.add_argument('output', nargs='?',
+                        help='output file (text) or base name of the .bin/.json pair (columnar), '
+                             'single file only')
+    parser.add_argument('--format', choices=FORMATS, default='text')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='number of depth steps held in memory at once (text format)')
+    parser.add_argument('--output-dir', help='write outputs here instead of next to the inputs')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: all cores)')
+    parser.add_argument('--force', action='store_true', help='convert even if the output is up to date')
+    parser.add_argument('--manifest', help=f'manifest of previous conversions (default: {MANIFEST_NAME} '
+                                           'in the output directory)')
+    args = parser.parse_args()
+
+    inputs = expand_inputs(args.lasfile)
+    if os.path.isdir(args.lasfile) or glob.has_magic(args.lasfile):
+        if args.output:
+            parser.error('use --output-dir with a directory or a glob pattern')
+        convert_batch(inputs, args.output_dir, args.format, args.workers, args.chunk_rows, args.force,
+                      manifest=args.manifest)
+        return
+
+    output = args.output or default_output(args.lasfile, args.format, args.output_dir)
+    print(format_result(convert_single(args.lasfile, output, args.format, args.chunk_rows, args.force,
+                                       args.manifest)))
+
+
+if __name__ == '__main__':
+    main()
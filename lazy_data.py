@@ -0,0 +1,60 @@
+'''
+Lazy, load-once data for the dashboards.
+
+Importing a dashboard does not parse or generate any data: every dataset is a
+LazyValue that is built on first use (the first request), once per process,
+and the page layout is a function so it is only built when a page is served.
+A worker therefore starts serving immediately.
+
+Preload mode shares the parsed data between worker processes instead: with
+DASHBOARD_PRELOAD=1 the data is loaded at import, so under
+
+    DASHBOARD_PRELOAD=1 gunicorn --preload --workers 8 dashboard:server
+
+it is loaded once in the gunicorn master and the forked workers share its
+memory pages (copy-on-write) rather than each parsing its own copy.
+'''
+import os
+import threading
+
+PRELOAD = os.environ.get('DASHBOARD_PRELOAD', '') not in ('', '0')
+
+
+class LazyValue:
+    '''A value built by build() on first get(), once, even with concurrent callers.'''
+
+    def __init__(self, build):
+        self.build = build
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self.build()
+                    self._loaded = True
+        return self._value
+
+    def set(self, value):
+        '''Replace the value (e.g. with a reloaded snapshot); readers see the old or the new one.'''
+        self._value = value
+        self._loaded = True
+
+    def reset(self):
+        '''Forget the value; the next get() builds it again.'''
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
+
+def preload(*values):
+    '''Build the values now when preload mode is on (call at the end of a dashboard module).'''
+    if PRELOAD:
+        for value in values:
+            value.get()
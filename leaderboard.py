@@ -0,0 +1,142 @@
+'''
+Top-N leaderboards of wells, updated as production comes in.
+
+A Leaderboard keeps the n largest values of one metric in a bounded min-heap:
+an update that does not beat the smallest value of the board is one
+comparison, one that does costs O(n) on the board only, never a pass over all
+the wells. Values are expected to grow (cumulative production); if a well of
+the board goes down, the board is rebuilt from the current values the next
+time it is read. Every change bumps the board version, so a page knows when
+its figure is out of date.
+
+Leaderboards holds the boards of some metrics over all wells and per value of
+scope columns (operator, state). Its methods lock the boards, so that pages can
+read them while another thread adds production: read them through top(), not
+through the Leaderboard objects.
+
+Example:
+    boards = Leaderboards(well_data, ['Oil_Produced', 'Gas_Produced'], n=10, key='Well',
+                          scopes=['Operator', 'State'])
+    boards.add(new_rows)                                  # Well, Oil_Produced, Gas_Produced increments
+    version, top = boards.top('Oil_Produced', 'State', 'Texas', 3)
+'''
+import heapq
+import threading
+from operator import itemgetter
+
+import pandas as pd
+
+
+class Leaderboard:
+    '''The n largest values of one metric, in a bounded min-heap.'''
+
+    def __init__(self, n=3):
+        self.n = n
+        self.values = {}     # key -> current value, of every key
+        self.heap = []       # [value, key] of the keys on the board, smallest first
+        self.members = set()
+        self.stale = False
+        self.version = 0
+
+    def __len__(self):
+        return len(self.members)
+
+    def update(self, key, value):
+        '''Set the value of a key; return whether the board changed.'''
+        previous = self.values.get(key)
+        self.values[key] = value
+        if key in self.members:
+            if value == previous:
+                return False
+            if value < previous:
+                self.stale = True    # another key may now belong on the board
+            for entry in self.heap:
+                if entry[1] == key:
+                    entry[0] = value
+                    break
+            heapq.heapify(self.heap)
+        elif len(self.heap) < self.n:
+            heapq.heappush(self.heap, [value, key])
+            self.members.add(key)
+        elif self.heap and value > self.heap[0][0]:
+            _, evicted = heapq.heapreplace(self.heap, [value, key])
+            self.members.discard(evicted)
+            self.members.add(key)
+        else:
+            return False
+        self.version += 1
+        return True
+
+    def add(self, key, amount):
+        return self.update(key, self.values.get(key, 0) + amount)
+
+    def _rebuild(self):
+        top = heapq.nlargest(self.n, self.values.items(), key=itemgetter(1))
+        self.heap = [[value, key] for key, value in top]
+        heapq.heapify(self.heap)
+        self.members = {key for key, _ in top}
+        self.stale = False
+
+    def items(self, n=None):
+        '''[(key, value)] of the board, largest first, at most n of them.'''
+        if self.stale:
+            self._rebuild()
+        return sorted(((key, value) for value, key in self.heap), key=itemgetter(1), reverse=True)[:n]
+
+
+class Leaderboards:
+    '''Leaderboards of some metrics over all wells and per value of some scope columns.'''
+
+    def __init__(self, frame, metrics, n=3, key='Well', scopes=()):
+        self.metrics = list(metrics)
+        self.n = n
+        self.key = key
+        self.scopes = [scope for scope in scopes if scope in frame.columns]
+        self.boards = {}     # (metric, scope, scope value) -> Leaderboard; (metric, None, None) for all wells
+        self.scope_values = {}   # well -> [(scope, value)]
+        self._lock = threading.Lock()
+        self.add(frame)
+
+    def board(self, metric, scope=None, value=None):
+        '''The Leaderboard itself; not safe to read while add() runs in another thread, see top().'''
+        board = self.boards.get((metric, scope, value))
+        return board if board is not None else Leaderboard(self.n)
+
+    def top(self, metric, scope=None, value=None, n=None):
+        '''(version, [(well, value)] largest first) of a board, read under the lock.'''
+        with self._lock:
+            board = self.board(metric, scope, value)
+            return board.version, board.items(n)
+
+    def options(self):
+        '''The (scope, value) pairs that have boards, all wells first.'''
+        with self._lock:
+            pairs = sorted({(scope, value) for _, scope, value in self.boards if scope is not None})
+        return [(None, None)] + pairs
+
+    def add(self, frame):
+        '''Add the metric values of some rows (increments per well); return the changed board ids.'''
+        changed = set()
+        if frame.empty or self.key not in frame.columns:
+            return changed
+        metrics = [metric for metric in self.metrics if metric in frame.columns]
+        # One row per well, so that a board is updated once per well and batch; the scopes of
+        # a well are those of its rows that have them, else those it already had
+        totals = frame.groupby(self.key, sort=False)[metrics].sum()
+        scopes = [scope for scope in self.scopes if scope in frame.columns]
+        scoped = frame.drop_duplicates(self.key, keep='last').set_index(self.key)[scopes].to_dict('index') \
+            if scopes else {}
+
+        with self._lock:
+            for well, values in zip(totals.index, totals.to_numpy()):
+                if well in scoped:
+                    self.scope_values[well] = [(scope, value) for scope, value in scoped[well].items()
+                                               if not pd.isna(value)]
+                for metric, amount in zip(metrics, values):
+                    for scope, value in [(None, None)] + self.scope_values.get(well, []):
+                        board_id = (metric, scope, value)
+                        if board_id not in self.boards:
+                            self.boards[board_id] = Leaderboard(self.n)
+                        if self.boards[board_id].add(well, amount):
+                            changed.add(board_id)
+        return changed
@@ -0,0 +1,182 @@
+'''
+Binary columnar cache for converted well logs.
+
+A well is stored as two files next to each other:
+- <name>.bin: the curves one after the other, each one contiguous, as
+  float32 when that keeps the precision of the LAS text and float64 otherwise;
+- <name>.json: the sidecar with the header metadata (UWI, API, STRT/STOP/STEP,
+  units, ...) and the dtype and byte offset of every curve.
+
+Reloading memory-maps the .bin file, so opening a well costs a JSON parse and
+nothing else; curves are only read from disk when they are used.
+
+Example:
+    write_log_cache('WA1', read_header('WA1.LAS'), read_data('WA1.LAS'))
+    meta, curves = load_log_cache('WA1')
+    curves['GR']   # read-only numpy.memmap
+'''
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+# LAS files are usually written with 5 decimals: keep float32 only if it rounds back to them
+DEFAULT_DECIMALS = 5
+_ALIGN = 8
+
+
+def cache_paths(base):
+    '''Return the (.bin, .json) paths of a cache; base may already end in either.'''
+    root, ext = os.path.splitext(base)
+    if ext not in ('.bin', '.json'):
+        root = base
+    return root + '.bin', root + '.json'
+
+
+def column_dtype(values, decimals=DEFAULT_DECIMALS):
+    '''float32 if the values survive the round trip to the given decimals, else float64.'''
+    narrowed = values.astype(np.float32).astype(np.float64)
+    tolerance = 0.5 * 10.0 ** -decimals
+    same = np.isclose(narrowed, values, rtol=0, atol=tolerance, equal_nan=True)
+    return np.float32 if same.all() else np.float64
+
+
+def _items(section):
+    return {item.mnemonic: {'unit': item.unit, 'value': item.value, 'description': item.description}
+            for item in section.values()}
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def header_metadata(header, source=None):
+    '''The JSON-serialisable part of a LasHeader that goes into the sidecar.'''
+    strt = header.well.get('STRT')
+    return {
+        'format': FORMAT_VERSION,
+        'source': os.path.basename(source) if source else None,
+        'well_name': header.well_value('WELL'),
+        'uwi': header.well_value('UWI'),
+        'api': header.well_value('API'),
+        'depth': {
+            'start': _float_or_none(header.well_value('STRT')),
+            'stop': _float_or_none(header.well_value('STOP')),
+            'step': _float_or_none(header.well_value('STEP')),
+            'unit': strt.unit if strt is not None else None,
+        },
+        'null': header.null_value,
+        'version': _items(header.version),
+        'well': _items(header.well),
+        'parameters': _items(header.parameters),
+        'other': list(header.other),
+    }
+
+
+def _write_atomic(path, write):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def write_metadata(base, meta):
+    '''(Re)write only the .json sidecar of a cache.'''
+    _, json_path = cache_paths(base)
+    _write_atomic(json_path, lambda f: f.write(json.dumps(meta, indent=1).encode('utf-8')))
+
+
+def write_log_cache(base, header, data, source=None, decimals=DEFAULT_DECIMALS):
+    '''Write a (rows, curves) array and its LasHeader as a columnar cache.
+
+    NULL values are expected as NaN (read_data() default). Returns the
+    metadata written to the sidecar.
+    '''
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim != 2 or data.shape[1] != len(header.curves):
+        raise ValueError(f'data has shape {data.shape}, expected (rows, {len(header.curves)})')
+
+    bin_path, _ = cache_paths(base)
+    meta = header_metadata(header, source)
+    meta['rows'] = int(data.shape[0])
+    meta['curves'] = []
+
+    columns = []
+    offset = 0
+    for i, curve in enumerate(header.curves):
+        column = np.ascontiguousarray(data[:, i].astype(column_dtype(data[:, i], decimals)))
+        meta['curves'].append({
+            'name': curve.mnemonic,
+            'unit': curve.unit,
+            'description': curve.description,
+            'dtype': column.dtype.str,
+            'offset': offset,
+        })
+        columns.append(column)
+        offset += -(-column.nbytes // _ALIGN) * _ALIGN
+
+    def write_columns(f):
+        for entry, column in zip(meta['curves'], columns):
+            f.seek(entry['offset'])
+            f.write(column.tobytes())
+        f.truncate(offset)
+
+    _write_atomic(bin_path, write_columns)
+    # The sidecar goes last so that a readable .json always describes a complete .bin
+    write_metadata(base, meta)
+    return meta
+
+
+def refresh_metadata(base, header, source=None):
+    '''Rewrite the sidecar from a new LasHeader, keeping the curves already in the .bin file.'''
+    old = read_metadata(base)
+    meta = header_metadata(header, source)
+    meta['rows'] = old['rows']
+    meta['curves'] = old['curves']
+    write_metadata(base, meta)
+    return meta
+
+
+def read_metadata(base):
+    _, json_path = cache_paths(base)
+    with open(json_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_log_cache(base, curves=None):
+    '''Return (metadata, {curve name: read-only memmap}) for a cache.
+
+    Pass a list of curve names to map only those.
+    '''
+    meta = read_metadata(base)
+    bin_path, _ = cache_paths(base)
+    rows = meta['rows']
+
+    wanted = meta['curves'] if curves is None else [c for c in meta['curves'] if c['name'] in curves]
+    missing = set(curves or ()) - {c['name'] for c in wanted}
+    if missing:
+        raise KeyError(f'curves not in {bin_path}: {sorted(missing)}')
+
+    # One mapping for the whole file; every curve is a view on its aligned slice
+    raw = np.memmap(bin_path, dtype=np.uint8, mode='r') if rows else None
+    columns = {}
+    for entry in wanted:
+        dtype = np.dtype(entry['dtype'])
+        if raw is None:
+            columns[entry['name']] = np.empty(0, dtype=dtype)
+            continue
+        start = entry['offset']
+        columns[entry['name']] = raw[start:start + rows * dtype.itemsize].view(dtype)
+    return meta, columns
+
+
+def load_log_frame(base, curves=None):
+    '''Same as load_log_cache() but as a pandas DataFrame (this copies the curves).'''
+    import pandas as pd
+
+    meta, columns = load_log_cache(base, curves)
+    return meta, pd.DataFrame(columns)
@@ -1,279 +1,356 @@
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, ctx
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
+import os
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime
 
+from lazy_data import LazyValue, preload
+from leaderboard import Leaderboards
+from rollup import FREQUENCIES, RollupStore
+
 # Initialize the Dash app
 app = dash.Dash(__name__)
 server = app.server
 
 
+# Producing states used for the state chart, then "State <n>" if more are asked for
+STATES = ['California', 'Texas', 'Oklahoma', 'Louisiana', 'Alaska', 'North Dakota', 'New Mexico', 'Colorado',
+          'Wyoming', 'Pennsylvania', 'West Virginia', 'Ohio', 'Utah', 'Montana', 'Kansas']
+
+# Size of the sample data; each one can be set from the environment (OIL_GAS_WELLS=10000 ...)
+# to load-test the dashboard, and OIL_GAS_SEED makes the data reproducible
+DATA_SIZE = {'operators': 2, 'states': 6, 'wells': 60, 'weeks': 53}
+DATA_SIZE.update({name: int(os.environ[f'OIL_GAS_{name.upper()}'])
+                  for name in DATA_SIZE if f'OIL_GAS_{name.upper()}' in os.environ})
+DATA_SEED = int(os.environ['OIL_GAS_SEED']) if 'OIL_GAS_SEED' in os.environ else None
+
+
 # Generate sample data
-def generate_data():
-    # Operator data
-    operators = ['Operator 1', 'Operator 2']
-
-    # Generate production data for oil and gas
-    dates = pd.date_range(start='2023-01-01', end='2023-12-31', freq='W')
-
-    production_data = []
-    for date in dates:
-        for operator in operators:
-            oil_current = np.random.randint(150000, 200000)
-            oil_previous = oil_current * np.random.uniform(0.85, 1.15)
-            oil_change = ((oil_current - oil_previous) / oil_previous) * 100
-
-            gas_current = np.random.randint(120000, 180000)
-            gas_previous = gas_current * np.random.uniform(0.85, 1.15)
-            gas_change = ((gas_current - gas_previous) / gas_previous) * 100
-
-            production_data.append({
-                'Date': date,
-                'Operator': operator,
-                'Oil_Current': oil_current,
-                'Oil_Previous': oil_previous,
-                'Oil_Change': oil_change,
-                'Gas_Current': gas_current,
-                'Gas_Previous': gas_previous,
-                'Gas_Change': gas_change
-            })
-
-    production_df = pd.DataFrame(production_data)
-
-    # Generate state production data
-    states = ['California', 'Texas', 'Oklahoma', 'Louisiana', 'Alaska', 'North Dakota']
-    state_data = []
-
-    for i in range(6):  # Last 6 weeks
-        week_date = dates[-i - 1]
-        for state in states:
-            production = np.random.randint(50000, 200000)
-            state_data.append({
-                'Week': f'Week {i + 1}',
-                'Date': week_date,
-                'State': state,
-                'Production': production
-            })
-
-    state_df = pd.DataFrame(state_data)
+def generate_data(operators=2, states=6, wells=60, weeks=53, seed=None, end_date='2023-12-31'):
+    '''Production, state and well tables, every value drawn at once per table.
+
+    weeks of weekly dates ending at end_date; the same seed gives the same data.
+    '''
+    rng = np.random.default_rng(seed)
+    operator_names = [f'Operator {i}' for i in range(1, operators + 1)]
+    state_names = (STATES + [f'State {i}' for i in range(len(STATES) + 1, states + 1)])[:states]
+
+    # Generate production data for oil and gas: one row per week and operator
+    dates = pd.date_range(end=end_date, periods=weeks, freq='W')
+    rows = weeks * operators
+    production = {'Date': np.repeat(dates, operators), 'Operator': np.tile(operator_names, weeks)}
+    for fluid, low, high in (('Oil', 150000, 200000), ('Gas', 120000, 180000)):
+        current = rng.integers(low, high, rows)
+        previous = current * rng.uniform(0.85, 1.15, rows)
+        production[f'{fluid}_Current'] = current
+        production[f'{fluid}_Previous'] = previous
+        production[f'{fluid}_Change'] = (current - previous) / previous * 100
+    production_df = pd.DataFrame(production, columns=['Date', 'Operator', 'Oil_Current', 'Oil_Previous',
+                                                      'Oil_Change', 'Gas_Current', 'Gas_Previous', 'Gas_Change'])
+
+    # Generate state production data: one row per week and state
+    state_df = pd.DataFrame({
+        'Date': np.repeat(dates, states),
+        'State': np.tile(state_names, weeks),
+        'Production': rng.integers(50000, 200000, weeks * states)
+    })
 
     # Generate well data
-    wells = [f'Well-{i}' for i in range(1, 61)]
-    well_data = []
+    oil_produced = rng.integers(8000, 15000, wells)
+    gas_produced = rng.integers(8000, 15000, wells)
+    well_df = pd.DataFrame({
+        'Well': [f'Well-{i}' for i in range(1, wells + 1)],
+        'Operator': rng.choice(operator_names, wells),
+        'State': rng.choice(state_names, wells),
+        'Oil_Produced': oil_produced,
+        'Oil_Target': oil_produced * rng.uniform(1.1, 1.3, wells),
+        'Gas_Produced': gas_produced,
+        'Gas_Target': gas_produced * rng.uniform(1.1, 1.3, wells)
+    })
 
-    for well in wells:
-        oil_produced = np.random.randint(8000, 15000)
-        oil_target = oil_produced * np.random.uniform(1.1, 1.3)
+    return production_df, state_df, well_df
 
-        gas_produced = np.random.randint(8000, 15000)
-        gas_target = gas_produced * np.random.uniform(1.1, 1.3)
 
-        well_data.append({
-            'Well': well,
-            'Oil_Produced': oil_produced,
-            'Oil_Target': oil_target,
-            'Gas_Produced': gas_produced,
-            'Gas_Target': gas_target
-        })
+KPI_COLUMNS = ['Oil_Current', 'Oil_Previous', 'Oil_Change', 'Gas_Current', 'Gas_Previous', 'Gas_Change']
 
-    well_df = pd.DataFrame(well_data)
 
-    return production_df, state_df, well_df
+def kpi_snapshot(production_data):
+    '''{operator: {KPI column: value}} of the latest week of every operator, in order of appearance.'''
+    latest = production_data.loc[production_data.groupby('Operator', sort=False)['Date'].idxmax()]
+    return latest.set_index('Operator')[KPI_COLUMNS].to_dict('index')
+
+
+# Top wells per metric: metric -> (target column, bar color, target bar color)
+LEADERBOARD_METRICS = {
+    'Oil_Produced': ('Oil_Target', '#e74c3c', '#f1948a'),
+    'Gas_Produced': ('Gas_Target', '#3498db', '#85c1e9'),
+}
+LEADERBOARD_SIZES = [3, 5, 10]
+LEADERBOARD_SCOPES = ['Operator', 'State']
+
+# Seconds between two leaderboard refreshes of the page
+LEADERBOARD_INTERVAL = 5
+
+# Periods the state chart can show, and how a period of each frequency is labelled
+ROLLUP_PERIODS = [6, 12, 24]
+ROLLUP_LABELS = {'week': 'Week to %Y-%m-%d', 'month': '%b %Y', 'year': '%Y'}
+
+# The tables and what is derived from them, built once per data refresh
+DashboardData = namedtuple('DashboardData', ['production', 'state', 'well', 'kpis', 'targets', 'leaderboards',
+                                             'rollups'])
+
 
+def build_data():
+    production_data, state_data, well_data = generate_data(**DATA_SIZE, seed=DATA_SEED)
+    targets = well_data.set_index('Well')[[target for target, _, _ in LEADERBOARD_METRICS.values()]]
+    leaderboards = Leaderboards(well_data, LEADERBOARD_METRICS, n=max(LEADERBOARD_SIZES), key='Well',
+                                scopes=LEADERBOARD_SCOPES)
+    rollups = RollupStore(state_data, key='State', date='Date', value='Production')
+    return DashboardData(production_data, state_data, well_data, kpi_snapshot(production_data), targets,
+                         leaderboards, rollups)
 
-# Generate the data
-production_data, state_data, well_data = generate_data()
 
-# Get the latest data for the dashboard
-latest_date = production_data['Date'].max()
-latest_production = production_data[production_data['Date'] == latest_date]
+# The data is generated on first use (or at import in preload mode), not when the module is imported
+dashboard_data = LazyValue(build_data)
 
-# Get top 3 oil and gas wells
-top_oil_wells = well_data.nlargest(3, 'Oil_Produced')
-top_gas_wells = well_data.nlargest(3, 'Gas_Produced')
 
-# Create the app layout
-app.layout = html.Div([
-    html.H1("Oil and Gas Production Monitoring Dashboard",
-            style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': 30}),
+def fluid_kpi(fluid, kpi, color, style):
+    return html.Div([
+        html.H4(fluid, style={'textAlign': 'center', 'color': color}),
+        html.H5(f"{kpi[f'{fluid}_Change']:.1f}%", style={'textAlign': 'center', 'color': color}),
+        html.P(f"Current week {kpi[f'{fluid}_Current']:,.0f} bbl",
+               style={'textAlign': 'center', 'marginBottom': '5px'}),
+        html.P(f"Previous week {kpi[f'{fluid}_Previous']:,.0f} bbl",
+               style={'textAlign': 'center', 'marginTop': '0px', 'color': '#7f8c8d'})
+    ], style=style)
 
-    # Operator KPIs
-    html.Div([
+
+def operator_card(operator, kpi):
+    return html.Div([
+        html.H3(operator, style={'textAlign': 'center'}),
         html.Div([
-            html.H3("Operator 1", style={'textAlign': 'center'}),
-            html.Div([
-                html.Div([
-                    html.H4("Oil", style={'textAlign': 'center', 'color': '#e74c3c'}),
-                    html.H5(
-                        f"{latest_production[latest_production['Operator'] == 'Operator 1']['Oil_Change'].values[0]:.1f}%",
-                        style={'textAlign': 'center', 'color': '#e74c3c'}),
-                    html.P(
-                        f"Current week {latest_production[latest_production['Operator'] == 'Operator 1']['Oil_Current'].values[0]:,.0f} bbl",
-                        style={'textAlign': 'center', 'marginBottom': '5px'}),
-                    html.P(
-                        f"Previous week {latest_production[latest_production['Operator'] == 'Operator 1']['Oil_Previous'].values[0]:,.0f} bbl",
-                        style={'textAlign': 'center', 'marginTop': '0px', 'color': '#7f8c8d'})
-                ], style={'width': '48%', 'display': 'inline-block', 'padding': '10px',
-                          'borderRight': '1px solid #ecf0f1'}),
+            fluid_kpi('Oil', kpi, '#e74c3c', {'width': '48%', 'display': 'inline-block', 'padding': '10px',
+                                              'borderRight': '1px solid #ecf0f1'}),
+            fluid_kpi('Gas', kpi, '#3498db', {'width': '48%', 'display': 'inline-block', 'padding': '10px',
+                                              'float': 'right'})
+        ], style={'backgroundColor': '#f8f9fa', 'padding': '15px', 'borderRadius': '5px'})
+    ], style={'width': '49%', 'marginBottom': '20px'})
+
+
+def record_production(rows):
+    '''Add new production (Well, Oil_Produced and Gas_Produced increments) to the leaderboards.'''
+    return dashboard_data.get().leaderboards.add(rows)
+
+
+def record_state_production(rows):
+    '''Add new production (State, Date, Production) to the weekly, monthly and yearly rollups.'''
+    return dashboard_data.get().rollups.append(rows)
+
+
+feed_lock = threading.Lock()
+last_feed = 0.0
+feed_rng = np.random.default_rng(DATA_SEED)
+
+
+def feed_sample_production(data, wells=20):
+    '''Sample feed standing in for the field data: new production for a few random wells,
+    at most once per interval however many pages are open.'''
+    global last_feed
+    with feed_lock:
+        if time.monotonic() - last_feed < LEADERBOARD_INTERVAL * 0.9 or data.well.empty:
+            return set()
+        last_feed = time.monotonic()
+        rows = data.well.iloc[feed_rng.integers(0, len(data.well), wells)]
+        oil_produced = feed_rng.integers(0, 1500, wells)
+        # The oil of the feed also counts for the state of each well, in the latest week
+        record_state_production(pd.DataFrame({
+            'Date': data.production['Date'].max(),
+            'State': rows['State'].to_numpy(),
+            'Production': oil_produced
+        }))
+        return record_production(pd.DataFrame({
+            'Well': rows['Well'].to_numpy(),
+            'Oil_Produced': oil_produced,
+            'Gas_Produced': feed_rng.integers(0, 1500, wells)
+        }))
+
+
+def scope_option(scope, value):
+    return {'label': 'All wells' if scope is None else f'{scope}: {value}',
+            'value': 'all' if scope is None else f'{scope}|{value}'}
+
+
+def leaderboard_figure(data, metric, top):
+    wells = [well for well, _ in top]
+    target, color, target_color = LEADERBOARD_METRICS[metric]
+    return {
+        'data': [
+            go.Bar(
+                name='Produced',
+                x=wells,
+                y=[produced for _, produced in top],
+                marker_color=color
+            ),
+            go.Bar(
+                name='Target',
+                x=wells,
+                y=data.targets[target].reindex(wells).to_numpy(),
+                marker_color=target_color
+            )
+        ],
+        'layout': go.Layout(
+            barmode='group',
+            plot_bgcolor='white',
+            paper_bgcolor='#f8f9fa',
+            showlegend=True,
+            yaxis_title='Production (bbl)'
+        )
+    }
+
+
+def state_production_figure(data, frequency, periods):
+    '''Grouped bars of the production of every state in the last periods of a frequency.'''
+    sums = data.rollups.last(frequency, periods)
+    state_data = sums.set_axis(sums.index.strftime(ROLLUP_LABELS[frequency]), axis=0) \
+        .rename_axis(index='Period', columns='State').stack().rename('Production').reset_index()
+    return px.bar(
+        state_data,
+        x='Period',
+        y='Production',
+        color='State',
+        title=f'Production by State, last {periods} {frequency}s',
+        barmode='group'
+    ).update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='#f8f9fa',
+        showlegend=True
+    )
 
-                html.Div([
-                    html.H4("Gas", style={'textAlign': 'center', 'color': '#3498db'}),
-                    html.H5(
-                        f"{latest_production[latest_production['Operator'] == 'Operator 1']['Gas_Change'].values[0]:.1f}%",
-                        style={'textAlign': 'center', 'color': '#3498db'}),
-                    html.P(
-                        f"Current week {latest_production[latest_production['Operator'] == 'Operator 1']['Gas_Current'].values[0]:,.0f} bbl",
-                        style={'textAlign': 'center', 'marginBottom': '5px'}),
-                    html.P(
-                        f"Previous week {latest_production[latest_production['Operator'] == 'Operator 1']['Gas_Previous'].values[0]:,.0f} bbl",
-                        style={'textAlign': 'center', 'marginTop': '0px', 'color': '#7f8c8d'})
-                ], style={'width': '48%', 'display': 'inline-block', 'padding': '10px', 'float': 'right'})
-            ], style={'backgroundColor': '#f8f9fa', 'padding': '15px', 'borderRadius': '5px'})
-        ], style={'width': '49%', 'display': 'inline-block'}),
 
+def build_layout():
+    data = dashboard_data.get()
+
+    return html.Div([
+        html.H1("Oil and Gas Production Monitoring Dashboard",
+                style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': 30}),
+
+        # Operator KPIs, one card per operator of the KPI snapshot
+        html.Div([operator_card(operator, kpi) for operator, kpi in data.kpis.items()],
+                 style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-between',
+                        'marginBottom': 30}),
+
+        # Charts row
         html.Div([
-            html.H3("Operator 2", style={'textAlign': 'center'}),
+            # Production by State chart, read from the rollups
             html.Div([
+                html.H3("Production by State", style={'textAlign': 'center'}),
                 html.Div([
-                    html.H4("Oil", style={'textAlign': 'center', 'color': '#e74c3c'}),
-                    html.H5(
-                        f"{latest_production[latest_production['Operator'] == 'Operator 2']['Oil_Change'].values[0]:.1f}%",
-                        style={'textAlign': 'center', 'color': '#e74c3c'}),
-                    html.P(
-                        f"Current week {latest_production[latest_production['Operator'] == 'Operator 2']['Oil_Current'].values[0]:,.0f} bbl",
-                        style={'textAlign': 'center', 'marginBottom': '5px'}),
-                    html.P(
-                        f"Previous week {latest_production[latest_production['Operator'] == 'Operator 2']['Oil_Previous'].values[0]:,.0f} bbl",
-                        style={'textAlign': 'center', 'marginTop': '0px', 'color': '#7f8c8d'})
-                ], style={'width': '48%', 'display': 'inline-block', 'padding': '10px',
-                          'borderRight': '1px solid #ecf0f1'}),
+                    dcc.Dropdown(
+                        id='state-frequency',
+                        options=[{'label': name.capitalize() + 'ly', 'value': name} for name in FREQUENCIES],
+                        value='week',
+                        clearable=False,
+                        style={'width': '49%', 'display': 'inline-block'}
+                    ),
+                    dcc.Dropdown(
+                        id='state-periods',
+                        options=[{'label': f'Last {periods}', 'value': periods} for periods in ROLLUP_PERIODS],
+                        value=ROLLUP_PERIODS[0],
+                        clearable=False,
+                        style={'width': '49%', 'display': 'inline-block', 'float': 'right'}
+                    )
+                ], style={'marginBottom': '10px'}),
+                dcc.Graph(id='state-production-chart'),
+                dcc.Store(id='state-production-version')
+            ], style={'width': '49%', 'display': 'inline-block'}),
+
+            # Top wells charts, refreshed when the leaderboards change
+            html.Div([
+                html.Div([
+                    dcc.Dropdown(
+                        id='leaderboard-scope',
+                        options=[scope_option(scope, value) for scope, value in data.leaderboards.options()],
+                        value='all',
+                        clearable=False,
+                        style={'width': '70%', 'display': 'inline-block'}
+                    ),
+                    dcc.Dropdown(
+                        id='leaderboard-size',
+                        options=[{'label': f'Top {size}', 'value': size} for size in LEADERBOARD_SIZES],
+                        value=LEADERBOARD_SIZES[0],
+                        clearable=False,
+                        style={'width': '28%', 'display': 'inline-block', 'float': 'right'}
+                    )
+                ], style={'marginBottom': '10px'}),
 
                 html.Div([
-                    html.H4("Gas", style={'textAlign': 'center', 'color': '#3498db'}),
-                    html.H5(
-                        f"{latest_production[latest_production['Operator'] == 'Operator 2']['Gas_Change'].values[0]:.1f}%",
-                        style={'textAlign': 'center', 'color': '#3498db'}),
-                    html.P(
-                        f"Current week {latest_production[latest_production['Operator'] == 'Operator 2']['Gas_Current'].values[0]:,.0f} bbl",
-                        style={'textAlign': 'center', 'marginBottom': '5px'}),
-                    html.P(
-                        f"Previous week {latest_production[latest_production['Operator'] == 'Operator 2']['Gas_Previous'].values[0]:,.0f} bbl",
-                        style={'textAlign': 'center', 'marginTop': '0px', 'color': '#7f8c8d'})
-                ], style={'width': '48%', 'display': 'inline-block', 'padding': '10px', 'float': 'right'})
-            ], style={'backgroundColor': '#f8f9fa', 'padding': '15px', 'borderRadius': '5px'})
-        ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'})
-    ], style={'marginBottom': 30}),
-
-    # Charts row
-    html.Div([
-        # Production by State chart
-        html.Div([
-            html.H3("Production by State in Last 6 Weeks", style={'textAlign': 'center'}),
-            dcc.Graph(
-                id='state-production-chart',
-                figure=px.bar(
-                    state_data,
-                    x='Week',
-                    y='Production',
-                    color='State',
-                    title='Production by State',
-                    barmode='group'
-                ).update_layout(
-                    plot_bgcolor='white',
-                    paper_bgcolor='#f8f9fa',
-                    showlegend=True
-                )
-            )
-        ], style={'width': '49%', 'display': 'inline-block'}),
+                    html.H4("Top Oil Producing Wells", style={'textAlign': 'center', 'color': '#e74c3c'}),
+                    dcc.Graph(id='top-oil-wells')
+                ], style={'width': '48%', 'display': 'inline-block'}),
 
-        # Top wells charts
-        html.Div([
-            html.Div([
-                html.H4("Top 3 Oil Producing Wells", style={'textAlign': 'center', 'color': '#e74c3c'}),
-                dcc.Graph(
-                    id='top-oil-wells',
-                    figure={
-                        'data': [
-                            go.Bar(
-                                name='Produced',
-                                x=top_oil_wells['Well'],
-                                y=top_oil_wells['Oil_Produced'],
-                                marker_color='#e74c3c'
-                            ),
-                            go.Bar(
-                                name='Target',
-                                x=top_oil_wells['Well'],
-                                y=top_oil_wells['Oil_Target'],
-                                marker_color='#f1948a'
-                            )
-                        ],
-                        'layout': go.Layout(
-                            barmode='group',
-                            plot_bgcolor='white',
-                            paper_bgcolor='#f8f9fa',
-                            showlegend=True,
-                            yaxis_title='Production (bbl)'
-                        )
-                    }
-                )
-            ], style={'width': '48%', 'display': 'inline-block'}),
+                html.Div([
+                    html.H4("Top Gas Producing Wells", style={'textAlign': 'center', 'color': '#3498db'}),
+                    dcc.Graph(id='top-gas-wells')
+                ], style={'width': '48%', 'display': 'inline-block', 'float': 'right'}),
 
-            html.Div([
-                html.H4("Top 3 Gas Producing Wells", style={'textAlign': 'center', 'color': '#3498db'}),
-                dcc.Graph(
-                    id='top-gas-wells',
-                    figure={
-                        'data': [
-                            go.Bar(
-                                name='Produced',
-                                x=top_gas_wells['Well'],
-                                y=top_gas_wells['Gas_Produced'],
-                                marker_color='#3498db'
-                            ),
-                            go.Bar(
-                                name='Target',
-                                x=top_gas_wells['Well'],
-                                y=top_gas_wells['Gas_Target'],
-                                marker_color='#85c1e9'
-                            )
-                        ],
-                        'layout': go.Layout(
-                            barmode='group',
-                            plot_bgcolor='white',
-                            paper_bgcolor='#f8f9fa',
-                            showlegend=True,
-                            yaxis_title='Production (bbl)'
-                        )
-                    }
-                )
-            ], style={'width': '48%', 'display': 'inline-block', 'float': 'right'})
-        ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'})
-    ]),
-
-    # Time series chart
-    html.Div([
-        html.H3("Production Trend Over Time", style={'textAlign': 'center', 'marginTop': '30px'}),
-        dcc.Dropdown(
-            id='production-type-selector',
-            options=[
-                {'label': 'Oil', 'value': 'Oil_Current'},
-                {'label': 'Gas', 'value': 'Gas_Current'}
-            ],
-            value='Oil_Current',
-            style={'width': '200px', 'margin': '0 auto'}
-        ),
-        dcc.Graph(id='production-trend-chart')
-    ], style={'marginTop': 30, 'padding': '10px', 'backgroundColor': '#f8f9fa', 'borderRadius': '5px'}),
-
-    # Footer
-    html.Div([
-        html.P("Data updated: " + datetime.now().strftime("%Y-%m-%d %H:%M"),
-               style={'textAlign': 'center', 'color': '#7f8c8d', 'marginTop': '30px'})
+                dcc.Interval(id='leaderboard-interval', interval=LEADERBOARD_INTERVAL * 1000),
+                dcc.Store(id='leaderboard-versions')
+            ], style={'width': '49%', 'display': 'inline-block', 'float': 'right'})
+        ]),
+
+        # Time series chart
+        html.Div([
+            html.H3("Production Trend Over Time", style={'textAlign': 'center', 'marginTop': '30px'}),
+            dcc.Dropdown(
+                id='production-type-selector',
+                options=[
+                    {'label': 'Oil', 'value': 'Oil_Current'},
+                    {'label': 'Gas', 'value': 'Gas_Current'}
+                ],
+                value='Oil_Current',
+                style={'width': '200px', 'margin': '0 auto'}
+            ),
+            dcc.Graph(id='production-trend-chart')
+        ], style={'marginTop': 30, 'padding': '10px', 'backgroundColor': '#f8f9fa', 'borderRadius': '5px'}),
+
+        # Footer
+        html.Div([
+            html.P("Data updated: " + datetime.now().strftime("%Y-%m-%d %H:%M"),
+                   style={'textAlign': 'center', 'color': '#7f8c8d', 'marginTop': '30px'})
+        ])
     ])
+
+
+# The layout only depends on the data: built on the first page served, then reused
+dashboard_layout = LazyValue(build_layout)
+
+
+def serve_layout():
+    return dashboard_layout.get()
+
+
+# Components of the callbacks, for validating them before the layout is first served
+app.validation_layout = html.Div([
+    dcc.Dropdown(id='production-type-selector'),
+    dcc.Graph(id='production-trend-chart'),
+    dcc.Dropdown(id='leaderboard-scope'),
+    dcc.Dropdown(id='leaderboard-size'),
+    dcc.Graph(id='top-oil-wells'),
+    dcc.Graph(id='top-gas-wells'),
+    dcc.Interval(id='leaderboard-interval'),
+    dcc.Store(id='leaderboard-versions'),
+    dcc.Dropdown(id='state-frequency'),
+    dcc.Dropdown(id='state-periods'),
+    dcc.Graph(id='state-production-chart'),
+    dcc.Store(id='state-production-version')
 ])
+app.layout = serve_layout
 
 
 # Callback for the production trend chart
@@ -282,6 +359,7 @@ app.layout = html.Div([
     [Input('production-type-selector', 'value')]
 )
 def update_production_chart(production_type):
+    production_data = dashboard_data.get().production
     fig = px.line(
         production_data,
         x='Date',
@@ -299,6 +377,58 @@ def update_production_chart(production_type):
     return fig
 
 
+# Callback for the top wells charts: on every tick, a figure is only sent again to a page
+# when its leaderboard changed and the wells shown on that page changed with it
+@app.callback(
+    [Output('top-oil-wells', 'figure'),
+     Output('top-gas-wells', 'figure'),
+     Output('leaderboard-versions', 'data')],
+    [Input('leaderboard-interval', 'n_intervals'),
+     Input('leaderboard-scope', 'value'),
+     Input('leaderboard-size', 'value')],
+    [State('leaderboard-versions', 'data')]
+)
+def update_leaderboards(n_intervals, scope, size, shown):
+    data = dashboard_data.get()
+    if ctx.triggered_id == 'leaderboard-interval':
+        feed_sample_production(data)
+
+    scope, _, value = scope.partition('|') if scope != 'all' else (None, None, None)
+    view = [scope, value, size]
+    boards = {metric: data.leaderboards.top(metric, scope, value, size) for metric in LEADERBOARD_METRICS}
+    versions = {metric: version for metric, (version, _) in boards.items()}
+    shown = shown or {}
+    if shown.get('view') == view and shown.get('versions') == versions:
+        raise dash.exceptions.PreventUpdate
+
+    tops = {metric: [[well, float(produced)] for well, produced in top] for metric, (_, top) in boards.items()}
+    same_view = shown.get('view') == view
+    figures = [dash.no_update if same_view and (shown.get('tops') or {}).get(metric) == tops[metric]
+               else leaderboard_figure(data, metric, boards[metric][1])
+               for metric in LEADERBOARD_METRICS]
+    return figures + [{'view': view, 'versions': versions, 'tops': tops}]
+
+
+# Callback for the state chart: redrawn when the rollups changed since the page last drew it
+@app.callback(
+    [Output('state-production-chart', 'figure'),
+     Output('state-production-version', 'data')],
+    [Input('leaderboard-interval', 'n_intervals'),
+     Input('state-frequency', 'value'),
+     Input('state-periods', 'value')],
+    [State('state-production-version', 'data')]
+)
+def update_state_chart(n_intervals, frequency, periods, shown):
+    data = dashboard_data.get()
+    drawn = {'view': [frequency, periods], 'version': data.rollups.version}
+    if shown == drawn:
+        raise dash.exceptions.PreventUpdate
+    return state_production_figure(data, frequency, periods), drawn
+
+
+# In preload mode, generate the data and the layout now so that forked workers share them
+preload(dashboard_data, dashboard_layout)
+
 # Run the app
 if __name__ == '__main__':
     app.run_server(debug=True, port=8050)
\ No newline at end of file
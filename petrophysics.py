@@ -0,0 +1,207 @@
+'''
+Vectorized petrophysical functions from "Basic well log interpretation.ipynb".
+
+Every function takes whole NumPy arrays (or pandas Series, or scalars) and
+broadcasts its parameters, so a parameter may be a single value or one value
+per sample (e.g. endpoints that change by zone). No Python loop over samples
+is needed.
+
+interpret() runs the notebook chain VCL -> PHIE -> SWa -> BVW in one pass over
+the logs, block by block, so only the outputs are allocated at full length.
+
+Example:
+    out = interpret({'GR': gr, 'NPHI': nphi, 'RHOB': rhob, 'ILD': ild})
+    out['PHIE'], out['SWa'], out['BVW']
+'''
+import numpy as np
+
+# Parameters used in the notebook for the Walakpa1 well (2960 - 3340 ft)
+DEFAULT_PARAMS = {
+    # Volume of clay
+    'gr_clean': 40.0, 'gr_clay': 135.0, 'gr_correction': None,
+    'sp_clean': -60.0, 'sp_clay': 2.0,
+    'neut_clean1': 15.0, 'den_clean1': 2.6,
+    'neut_clean2': 40.0, 'den_clean2': 2.0,
+    'neut_clay': 47.5, 'den_clay': 2.8,
+    # Porosity: matrix, fluid and shale values
+    'dt_ma': 55.5, 'dt_fl': 188.0, 'dt_sh': 90.0, 'cp': 1.0, 'alpha': 5 / 8,
+    'den_ma': 2.65, 'den_fl': 1.1, 'den_sh': 2.4,
+    'phin_sh': 45.0,
+    # Archie: tortuosity, cementation and saturation exponents, water resistivity
+    'a': 1.0, 'm': 1.8, 'n': 2.0, 'rw': 0.45,
+}
+
+# Curves interpret() needs from the logs
+REQUIRED_CURVES = ('GR', 'NPHI', 'RHOB', 'ILD')
+
+DEFAULT_BLOCK_ROWS = 8192
+
+
+# ---------------------------------------------------------------- VCL
+
+def vclgr(gr_log, gr_clean, gr_clay, correction=None):
+    '''Volume of clay from gamma ray, with an optional non-linear correction.
+
+    correction: None (linear), "young" or "older" (Larionov 1969),
+    "clavier" (Clavier 1971) or "steiber" (Steiber 1969).
+    '''
+    igr = (np.asarray(gr_log, dtype=float) - gr_clean) / (gr_clay - gr_clean)   #Linear Gamma Ray
+    if correction is None:
+        return igr
+    if correction == "young":
+        return 0.083 * (2 ** (3.7 * igr) - 1)             #Larionov (1969) - Tertiary rocks
+    if correction == "older":
+        return 0.33 * (2 ** (2 * igr) - 1)                #Larionov (1969) - Older rocks
+    if correction == "clavier":
+        with np.errstate(invalid='ignore'):
+            return 1.7 - (3.38 - (igr + 0.7) ** 2) ** 0.5  #Clavier (1971)
+    if correction == "steiber":
+        return 0.5 * igr / (1.5 - igr)                    #Steiber (1969) - Tertiary rocks
+    raise ValueError(f'unknown gamma ray correction: {correction!r}')
+
+
+def vclsp(sp_log, sp_clean, sp_clay):
+    return (np.asarray(sp_log, dtype=float) - sp_clean) / (sp_clay - sp_clean)
+
+
+def vclrt(rt_log, rt_clean, rt_clay):
+    rt_log = np.asarray(rt_log, dtype=float)
+    vrt = (rt_clay / rt_log) * (rt_clean - rt_log) / (rt_clean - rt_clay)
+    with np.errstate(invalid='ignore'):
+        corrected = 0.5 * (2 * vrt) ** (0.67 * (vrt + 1))
+    return np.where(rt_log > 2 * rt_clay, corrected, vrt)
+
+
+def vclnd(neut_log, den_log, neut_clean1, den_clean1, neut_clean2, den_clean2, neut_clay, den_clay):
+    '''Volume of clay from the neutron-density crossplot: clean line and clay point.'''
+    term1 = (den_clean2 - den_clean1) * (np.asarray(neut_log, dtype=float) - neut_clean1) \
+        - (np.asarray(den_log, dtype=float) - den_clean1) * (neut_clean2 - neut_clean1)
+    term2 = (den_clean2 - den_clean1) * (neut_clay - neut_clean1) - (den_clay - den_clean1) * (neut_clean2 - neut_clean1)
+    return term1 / term2
+
+
+# ---------------------------------------------------------------- Porosity
+
+#Willie-TimeAverage
+def phis_shale(dt_sh, dt_ma, dt_fl):
+    return (dt_sh - dt_ma) / (dt_fl - dt_ma)
+
+
+def phis_w(dt_log, dt_ma, dt_fl, cp):
+    return (1 / cp) * (np.asarray(dt_log, dtype=float) - dt_ma) / (dt_fl - dt_ma)
+
+
+def phis_w_sh_corr(dt_log, dt_ma, dt_fl, cp, dt_sh, vcl):
+    return phis_w(dt_log, dt_ma, dt_fl, cp) - vcl * phis_shale(dt_sh, dt_ma, dt_fl)
+
+
+#Raymer-Hunt-Gardner (the alpha(5/8) ranges from 0.625-0.70, 0.67-most, 0.60-gas reservoirs)
+def phis_rhg(dt_log, dt_ma, alpha):
+    dt_log = np.asarray(dt_log, dtype=float)
+    return alpha * (dt_log - dt_ma) / dt_log
+
+
+def phis_rhg_sh_corr(dt_log, dt_ma, dt_sh, vcl, dt_fl=DEFAULT_PARAMS['dt_fl']):
+    '''The notebook version read dt_fl from a global; it is a parameter here.'''
+    return phis_rhg(dt_log, dt_ma, 5 / 8) - vcl * phis_shale(dt_sh, dt_ma, dt_fl)
+
+
+#Density
+def phid(den_log, den_ma, den_fl, den_sh=None, vcl=None):
+    return (np.asarray(den_log, dtype=float) - den_ma) / (den_fl - den_ma)
+
+
+def phid_shale(den_sh, den_ma, den_fl):
+    return (den_sh - den_ma) / (den_fl - den_ma)
+
+
+def phid_sh_corr(den, den_ma, den_fl, den_sh, vcl):
+    return phid(den, den_ma, den_fl) - vcl * phid_shale(den_sh, den_ma, den_fl)
+
+
+# NEUTRON (logs in %):
+def phin_sh_corr(neut, neut_sh, vcl):
+    return (np.asarray(neut, dtype=float) - vcl * neut_sh) / 100
+
+
+#Neutron-Density
+def phixnd(phinshc, phidshc):
+    return (np.asarray(phinshc, dtype=float) + phidshc) / 2
+
+
+def phixnd_gas_corr(phin, phid, phin_sh=None, phid_sh=None):
+    '''Root mean square of neutron and density porosity, for gas intervals (NPHI < DPHI crossover).
+
+    The notebook version squared phin twice; this uses phin and phid.
+    '''
+    phin = np.asarray(phin, dtype=float)
+    return np.sqrt((phin ** 2 + np.asarray(phid, dtype=float) ** 2) / 2)
+
+
+# ---------------------------------------------------------------- Saturation
+
+def sw_archie(Rw, Rt, Poro, a, m, n):
+    with np.errstate(divide='ignore'):   # zero porosity gives an infinite SW, clipped by the caller
+        F = a / (np.asarray(Poro, dtype=float) ** m)
+    return (F * Rw / Rt) ** (1 / n)
+
+
+# ---------------------------------------------------------------- Fused chain
+
+def _param_block(value, n, start, stop):
+    '''Slice a per-sample parameter to the current block; scalars pass through.'''
+    if np.ndim(value) == 0:
+        return value
+    value = np.asarray(value, dtype=float)
+    if value.shape[0] != n:
+        raise ValueError(f'per-sample parameter has {value.shape[0]} values for {n} samples')
+    return value[start:stop]
+
+
+def interpret(logs, params=None, block_rows=DEFAULT_BLOCK_ROWS):
+    '''Run VCL -> PHIE -> SWa -> BVW over whole logs.
+
+    logs maps curve names to 1-D arrays (a dict, a DataFrame, or the columns
+    of load_log_cache()); GR, NPHI (%), RHOB and ILD are needed. params
+    overrides DEFAULT_PARAMS; any numeric parameter can be an array with one
+    value per sample. The logs are processed in blocks of block_rows samples
+    so the intermediates stay in cache and no full-length temporaries are
+    allocated besides the outputs.
+
+    Returns a dict of float64 arrays: VCL, PHIDshc, PHINshc, PHIE, SWa, BVW, matrix,
+    with the same meaning and clipping as in the notebook.
+    '''
+    p = dict(DEFAULT_PARAMS)
+    if params:
+        unknown = set(params) - set(p)
+        if unknown:
+            raise KeyError(f'unknown parameters: {sorted(unknown)}')
+        p.update(params)
+
+    missing = [curve for curve in REQUIRED_CURVES if curve not in logs]
+    if missing:
+        raise KeyError(f'missing curves: {missing}')
+    gr, nphi, rhob, ild = (np.asarray(logs[curve], dtype=float) for curve in REQUIRED_CURVES)
+    n = gr.shape[0]
+
+    out = {name: np.empty(n) for name in ('VCL', 'PHIDshc', 'PHINshc', 'PHIE', 'SWa', 'BVW', 'matrix')}
+    numeric = {key: value for key, value in p.items() if key != 'gr_correction'}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            q = {key: _param_block(value, n, start, stop) for key, value in numeric.items()}
+            vcl = out['VCL'][start:stop]
+            phidshc = out['PHIDshc'][start:stop]
+            phinshc = out['PHINshc'][start:stop]
+            phie = out['PHIE'][start:stop]
+            swa = out['SWa'][start:stop]
+
+            vcl[:] = vclgr(gr[start:stop], q['gr_clean'], q['gr_clay'], p['gr_correction'])
+            np.clip(phid_sh_corr(rhob[start:stop], q['den_ma'], q['den_fl'], q['den_sh'], vcl), 0, 1, out=phidshc)
+            np.clip(phin_sh_corr(nphi[start:stop], q['phin_sh'], vcl), 0, 1, out=phinshc)
+            np.clip(phixnd(phinshc, phidshc), 0, 1, out=phie)
+            np.clip(sw_archie(q['rw'], ild[start:stop], phie, q['a'], q['m'], q['n']), 0, 1, out=swa)
+            np.multiply(swa, phie, out=out['BVW'][start:stop])
+            np.subtract(1 - vcl, phie, out=out['matrix'][start:stop])
+    return out
@@ -0,0 +1,66 @@
+'''
+Production data partitioned by well and sorted by date.
+
+The rows are sorted once at load time by (well, date), so every well is a
+contiguous block of rows. Selecting a well is a dictionary lookup, and a date
+window inside it is two binary searches on the date column: no comparison over
+the whole table per request.
+
+Example:
+    store = ProductionStore(production_data)                  # WELL / DATE columns
+    store.select('Well_01', '2016-01-01', '2017-12-31')       # same rows as the boolean mask
+    store = ProductionStore(production_data, key='Field', date='Date')
+'''
+import numpy as np
+import pandas as pd
+
+
+class ProductionStore:
+    '''Rows of a production table, partitioned by key and sorted by date within each partition.'''
+
+    def __init__(self, frame, key='WELL', date='DATE'):
+        self.key = key
+        self.date = date
+        if frame.empty or key not in frame.columns or date not in frame.columns:
+            self.frame = frame.iloc[:0]
+            self.dates = np.array([], dtype='datetime64[ns]')
+            self.partitions = {}
+            return
+
+        frame = frame.copy()
+        frame[date] = pd.to_datetime(frame[date])
+        self.frame = frame.sort_values([key, date], kind='stable').reset_index(drop=True)
+        self.dates = self.frame[date].to_numpy()
+
+        # {key: (start, stop)} row range of every partition
+        keys = self.frame[key].to_numpy()
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        stops = np.r_[starts[1:], len(keys)]
+        self.partitions = {keys[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __contains__(self, name):
+        return name in self.partitions
+
+    @property
+    def names(self):
+        return list(self.partitions)
+
+    def _bound(self, value, start, stop, side):
+        value = pd.Timestamp(value).to_datetime64()
+        return start + int(np.searchsorted(self.dates[start:stop], value, side=side))
+
+    def index_range(self, name, start_date=None, end_date=None):
+        '''(start, stop) rows of one partition with start_date <= date <= end_date (None: open).'''
+        start, stop = self.partitions.get(name, (0, 0))
+        if start == stop:
+            return 0, 0
+        first = start if start_date is None else self._bound(start_date, start, stop, 'left')
+        last = stop if end_date is None else self._bound(end_date, start, stop, 'right')
+        return first, max(first, last)
+
+    def select(self, name, start_date=None, end_date=None):
+        '''The rows of one partition in a date window, sorted by date.'''
+        return self.frame.iloc[slice(*self.index_range(name, start_date, end_date))]
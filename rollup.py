@@ -0,0 +1,107 @@
+'''
+Sums of production per key (state) in week, month and year buckets, updated as rows arrive.
+
+Every frequency keeps a dense array of sums with one row per period and one
+column per key. Appending rows adds their values to their buckets
+(np.add.at), and "the last N periods" is a slice of N rows of that array,
+whatever the number of raw rows that went into them.
+
+Example:
+    rollups = RollupStore(state_data, key='State', date='Date', value='Production')
+    rollups.append(new_rows)
+    rollups.last('month', 6)       # last 6 months, one row per month and one column per state
+'''
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Bucket name -> pandas period frequency
+FREQUENCIES = {'week': 'W', 'month': 'M', 'year': 'Y'}
+
+
+class RollupStore:
+    '''Per-key sums of a value in time buckets of some frequencies.'''
+
+    def __init__(self, frame, key='State', date='Date', value='Production', frequencies=FREQUENCIES):
+        self.key = key
+        self.date = date
+        self.value = value
+        self.frequencies = dict(frequencies)
+        self.keys = []        # key of every column
+        self.columns = {}     # key -> column
+        self.first = {}       # frequency -> period of the first row
+        self.periods = dict.fromkeys(self.frequencies, 0)   # rows in use
+        self.sums = {name: np.zeros((0, 0)) for name in self.frequencies}
+        self.rows = 0
+        self.version = 0
+        self._lock = threading.Lock()
+        self.append(frame)
+
+    def _key_columns(self, keys):
+        codes, uniques = pd.factorize(keys)
+        for key in uniques:
+            if key not in self.columns:
+                self.columns[key] = len(self.keys)
+                self.keys.append(key)
+        return np.array([self.columns[key] for key in uniques], dtype=np.int64)[codes]
+
+    def _reserve(self, name, low, high):
+        '''Make room for the periods of ordinals low..high and for every key.'''
+        sums, periods = self.sums[name], self.periods[name]
+        if periods == 0:
+            self.first[name] = pd.Period(ordinal=low, freq=self.frequencies[name])
+            start = low
+        else:
+            start = self.first[name].ordinal
+        shift = max(start - low, 0)
+        needed = max(high - start + 1, periods) + shift
+        if shift or needed > sums.shape[0] or len(self.keys) > sums.shape[1]:
+            # Doubling the rows (or the columns) when they are short keeps a stream of new periods
+            # (or of new keys) cheap
+            rows = needed if shift or needed <= sums.shape[0] else max(needed, 2 * sums.shape[0])
+            columns = sums.shape[1] if len(self.keys) <= sums.shape[1] else max(len(self.keys), 2 * sums.shape[1])
+            grown = np.zeros((rows, columns))
+            grown[shift:shift + periods, :sums.shape[1]] = sums[:periods]
+            self.sums[name] = grown
+        if shift:
+            self.first[name] = self.first[name] - shift
+        self.periods[name] = needed
+
+    def append(self, frame):
+        '''Add the values of some rows (key, date, value) to their buckets.'''
+        if frame.empty or not {self.key, self.date, self.value}.issubset(frame.columns):
+            return self
+        frame = frame[frame[self.key].notna() & frame[self.date].notna()]
+        if frame.empty:
+            return self
+        values = np.nan_to_num(frame[self.value].to_numpy(dtype=float))
+        dates = pd.DatetimeIndex(pd.to_datetime(frame[self.date]))
+        with self._lock:
+            columns = self._key_columns(frame[self.key].to_numpy())
+            for name, frequency in self.frequencies.items():
+                ordinals = dates.to_period(frequency).asi8
+                self._reserve(name, int(ordinals.min()), int(ordinals.max()))
+                np.add.at(self.sums[name], (ordinals - self.first[name].ordinal, columns), values)
+            self.rows += len(frame)
+            self.version += 1
+        return self
+
+    def last(self, frequency, n, end=None):
+        '''Sums of the last n periods up to end (default: the latest period with data),
+        one row per period (PeriodIndex) and one column per key.'''
+        # Under the lock: append() may grow or shift the arrays and add keys meanwhile
+        with self._lock:
+            keys = list(self.keys)
+            periods = self.periods[frequency]
+            if periods == 0:
+                return pd.DataFrame(columns=keys, dtype=float)
+            first = self.first[frequency]
+            stop = periods
+            if end is not None:
+                stop = min(max(pd.Period(end, freq=self.frequencies[frequency]).ordinal - first.ordinal + 1, 0),
+                           periods)
+            start = max(stop - n, 0)
+            sums = self.sums[frequency][start:stop, :len(keys)].copy()
+        index = pd.period_range(start=first + start, periods=stop - start, freq=self.frequencies[frequency])
+        return pd.DataFrame(sums, index=index, columns=keys).rename_axis('Period')
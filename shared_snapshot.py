@@ -0,0 +1,177 @@
+'''
+Dashboard data snapshots in shared memory, for many worker processes.
+
+publish() pickles a snapshot (its DataFrames, ProductionStore, WellAggregates)
+with pickle protocol 5, so that every contiguous NumPy buffer (numeric and
+datetime columns, sorted per-well values) is written once into a shared memory
+segment next to the pickle instead of into it. attach() unpickles it with
+those buffers pointing into the segment: the columns are not copied, and they
+are read-only, so no process can modify the data of the others. Only what is
+not a NumPy buffer (column names, object/string columns) is unpickled per
+process, which is why shareable() turns repeated strings (well names) into
+categoricals, stored as integer codes, before they are published.
+
+The workers must be forked from the process that created the SharedSnapshots
+(gunicorn --preload): the published version is a counter in memory shared with
+them, and they inherit the mappings of the segments published before the fork.
+When a newer snapshot is published, each worker sees the new version on its
+next request and attaches it by name.
+
+Example:
+    shared = SharedSnapshots('dashboard')
+    data = shared.publish(data, data.version)  # loading process; returns the shared copy
+    if shared.version != data.version:         # worker, on a request
+        data = shared.attach()
+'''
+import atexit
+import os
+import pickle
+import struct
+import threading
+from multiprocessing import RawValue, shared_memory
+
+import pandas as pd
+
+# Buffers start on cache line boundaries
+ALIGNMENT = 64
+
+_HEADER = struct.Struct('<QQ')   # pickle size, number of buffers
+_ENTRY = struct.Struct('<QQ')    # offset and size of one buffer
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class _Segment(shared_memory.SharedMemory):
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass   # arrays still use the mapping; it goes away with the process
+
+
+def shareable(frame, max_ratio=0.5):
+    '''frame with its string columns of few distinct values as categoricals (shared as codes).'''
+    columns = {}
+    for column in frame.columns:
+        values = frame[column]
+        if (values.dtype == object or pd.api.types.is_string_dtype(values.dtype)) \
+                and not isinstance(values.dtype, pd.CategoricalDtype) \
+                and values.nunique() <= max_ratio * len(values):
+            columns[column] = values.astype('category')
+    return frame.assign(**columns) if columns else frame
+
+
+def write_segment(obj, name):
+    '''Pickle obj into a new shared memory segment, its NumPy buffers out of the pickle.'''
+    buffers = []
+    data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+
+    # Header, buffer table and pickle, then every buffer at an aligned offset
+    entries = []
+    offset = _aligned(_HEADER.size + _ENTRY.size * len(raws) + len(data))
+    for raw in raws:
+        entries.append((offset, raw.nbytes))
+        offset = _aligned(offset + raw.nbytes)
+
+    segment = _Segment(name=name, create=True, size=offset)
+    buf = segment.buf
+    _HEADER.pack_into(buf, 0, len(data), len(raws))
+    position = _HEADER.size
+    for entry in entries:
+        _ENTRY.pack_into(buf, position, *entry)
+        position += _ENTRY.size
+    buf[position:position + len(data)] = data
+    for (start, size), raw in zip(entries, raws):
+        buf[start:start + size] = raw
+    del buf
+    return segment
+
+
+def read_segment(segment):
+    '''Unpickle the object of a segment, its NumPy arrays being read-only views of the segment.'''
+    view = segment.buf.toreadonly()
+    size, count = _HEADER.unpack_from(view, 0)
+    entries = [_ENTRY.unpack_from(view, _HEADER.size + i * _ENTRY.size) for i in range(count)]
+    start = _HEADER.size + _ENTRY.size * count
+    return pickle.loads(view[start:start + size],
+                        buffers=[view[offset:offset + length] for offset, length in entries])
+
+
+class SharedSnapshots:
+    '''Versioned snapshots published by one process and attached by its forked workers.'''
+
+    def __init__(self, prefix):
+        self.pid = os.getpid()
+        self.prefix = f'{prefix}-{self.pid}'
+        self._version = RawValue('q', -1)   # shared with the forked workers
+        self._segments = {}                 # version -> segment mapped in this process
+        self._attached = None               # (version, object) last attached in this process
+        self._lock = threading.Lock()
+        atexit.register(self._unlink)
+        # A fork while another thread publishes must not leave the lock held in the child
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        '''Version of the latest published snapshot, -1 before the first one.'''
+        return self._version.value
+
+    def _name(self, version):
+        return f'{self.prefix}-{version}'
+
+    def publish(self, obj, version):
+        '''Write obj as the snapshot of a new version; returns the shared copy to use instead of obj.'''
+        with self._lock:
+            previous = self.version
+            segment = write_segment(obj, self._name(version))
+            self._segments[version] = segment
+            self._attached = version, read_segment(segment)
+            self._version.value = version
+            # Processes that attached the previous version keep their mapping; no new one can
+            if previous >= 0 and previous in self._segments:
+                self._segments[previous].unlink()
+            self._release()
+            return self._attached[1]
+
+    def attach(self):
+        '''The latest published snapshot, mapped without copying its buffers.'''
+        with self._lock:
+            while True:
+                version = self.version
+                if self._attached is not None and self._attached[0] == version:
+                    return self._attached[1]
+                try:
+                    segment = self._segments.get(version) or _Segment(name=self._name(version))
+                except FileNotFoundError:
+                    continue   # replaced by a newer version between the two reads
+                self._segments[version] = segment
+                self._attached = version, read_segment(segment)
+                self._release()
+                return self._attached[1]
+
+    def _release(self):
+        '''Unmap the segments of older versions that nothing in this process uses any more.'''
+        current = self._attached[0]
+        for version, segment in list(self._segments.items()):
+            if version == current:
+                continue
+            try:
+                segment.close()
+            except BufferError:
+                continue   # some arrays of that version are still referenced
+            del self._segments[version]
+
+    def _unlink(self):
+        if os.getpid() == self.pid:
+            for segment in self._segments.values():
+                try:
+                    segment.unlink()
+                except FileNotFoundError:
+                    pass
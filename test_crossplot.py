@@ -0,0 +1,35 @@
+'''
+Tests of the crossplot density grids against np.histogram2d.
+
+Run with: python -m pytest test_crossplot.py
+'''
+import numpy as np
+
+from crossplot import DensityGrid, ND_NPHI_RANGE, ND_RHOB_RANGE, PICKETT_PHIE_RANGE, PICKETT_RT_RANGE, \
+    nd_grid, pickett_grid
+
+
+def test_counts_match_histogram2d():
+    rng = np.random.default_rng(0)
+    nphi, rhob = rng.uniform(-10, 70, 10000), rng.uniform(1.3, 3.2, 10000)
+    grid = nd_grid(nphi, rhob, bins=(50, 50))
+    expected, _, _ = np.histogram2d(nphi, rhob, bins=[grid.x_edges, grid.y_edges])
+    assert np.array_equal(grid.counts, expected)
+
+
+def test_values_on_and_just_below_the_upper_edges():
+    hi_x, hi_y = ND_NPHI_RANGE[1], ND_RHOB_RANGE[1]
+    below = np.nextafter(hi_x, 0), np.nextafter(hi_y, 0)
+    grid = nd_grid(np.array([below[0], hi_x, below[0]]), np.array([2.0, 2.0, below[1]]))
+    assert grid.total == 3
+    assert grid.counts[-1].sum() == 3 and grid.counts[-1, -1] == 1
+
+    rt, phie = np.nextafter(PICKETT_RT_RANGE[1], 0), np.nextafter(PICKETT_PHIE_RANGE[1], 0)
+    grid = pickett_grid(np.array([rt]), np.array([phie]))
+    assert grid.counts[-1, -1] == 1
+
+
+def test_values_outside_are_not_counted():
+    grid = DensityGrid((0, 1), (0, 1), bins=(10, 10))
+    grid.add(np.array([-0.1, 0.5, 1.1, np.nextafter(1, 2)]), np.array([0.5, 0.5, 0.5, 0.5]))
+    assert grid.total == 1
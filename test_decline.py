@@ -0,0 +1,63 @@
+'''
+Tests of the Arps decline functions of decline.py: closed forms against numeric integration,
+and fits of noise-free curves.
+
+Run with: python -m pytest test_decline.py
+'''
+import numpy as np
+import pytest
+from scipy.integrate import quad
+
+from decline import arps_cumulative, arps_eur, arps_rate, fit_declines
+
+# (qi, di, b): exponential, hyperbolic, harmonic and a b above 1
+CURVES = [(1000.0, 0.05, 0.0), (1000.0, 0.08, 0.5), (800.0, 0.1, 1.0), (1200.0, 0.2, 1.5)]
+
+
+@pytest.mark.parametrize('qi, di, b', CURVES)
+def test_cumulative_matches_numeric_integration(qi, di, b):
+    months = np.array([1.0, 12.0, 120.0, 300.0])
+    expected = [quad(lambda t: float(arps_rate(t, qi, di, b)), 0, t_max)[0] for t_max in months]
+    assert np.allclose(arps_cumulative(months, qi, di, b), expected, rtol=1e-8)
+
+
+@pytest.mark.parametrize('qi, di, b', CURVES)
+def test_eur_stops_at_the_economic_limit(qi, di, b):
+    def produced(end):
+        return quad(lambda t: float(arps_rate(t, qi, di, b)), 0, end, limit=200)[0]
+
+    # The time the rate falls to the limit, found on a fine grid, at most the horizon
+    limit = 50.0
+    t = np.linspace(0, 300, 300001)
+    below = arps_rate(t, qi, di, b) <= limit
+    end = t[np.argmax(below)] if below.any() else 300.0
+    assert arps_eur(qi, di, b, 300, limit) == pytest.approx(produced(end), rel=1e-3)
+    assert arps_eur(qi, di, b, 300) == pytest.approx(produced(300.0), rel=1e-8)
+
+
+def test_scalars_give_scalars():
+    for qi, di, b in CURVES:
+        rate = arps_rate(10.0, qi, di, b)
+        assert np.ndim(rate) == 0
+        assert rate == pytest.approx(float(arps_rate(np.array([10.0]), qi, di, b)[0]))
+    assert arps_rate(10.0, 100.0, 0.1, 0.5) == pytest.approx(100.0 / (1 + 0.5 * 0.1 * 10) ** 2)
+    assert arps_rate(10, 100, 0.1, 0) == pytest.approx(100.0 * np.exp(-1.0))
+    assert float(arps_cumulative(10.0, 100.0, 0.1, 0.5)) == pytest.approx(
+        quad(lambda t: float(arps_rate(t, 100.0, 0.1, 0.5)), 0, 10)[0])
+
+
+def test_rates_broadcast():
+    rates = arps_rate(np.arange(24.0)[:, None], 1000.0, 0.05, np.array([0.0, 0.5, 1.0]))
+    assert rates.shape == (24, 3)
+    assert np.allclose(rates[:, 0], 1000.0 * np.exp(-0.05 * np.arange(24.0)))
+
+
+def test_fit_recovers_noise_free_curves():
+    t = np.tile(np.arange(36.0), len(CURVES))
+    codes = np.repeat(np.arange(len(CURVES)), 36)
+    q = np.concatenate([arps_rate(np.arange(36.0), *curve) for curve in CURVES])
+    qi, di, b, sse, count = fit_declines(t, q, codes, len(CURVES))
+    assert np.allclose(qi, [curve[0] for curve in CURVES])
+    assert np.allclose(di, [curve[1] for curve in CURVES])
+    assert np.allclose(b, [curve[2] for curve in CURVES])
+    assert (count == 36).all()
@@ -0,0 +1,180 @@
+'''
+Tests of weather_report.WeatherClient against a local aiohttp stub of ipify, ipapi.co and wttr.in.
+
+Run with: python -m pytest test_weather_report.py
+'''
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from weather_report import WeatherClient
+
+# Seconds the stub takes to answer a weather request, so that concurrent requests overlap
+WEATHER_DELAY = 0.05
+
+
+class Stub:
+    '''The three services, counting the requests they get and failing the paths asked for.'''
+
+    def __init__(self):
+        self.hits = {'ip': 0, 'geo': 0, 'weather': 0}
+        self.failures = {}   # path -> number of requests still to answer with an error
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def fail(self, path, times=1):
+        self.failures[path] = times
+
+    def _failing(self, request):
+        if self.failures.get(request.path, 0) > 0:
+            self.failures[request.path] -= 1
+            return True
+        return False
+
+    async def ip(self, request):
+        self.hits['ip'] += 1
+        return web.json_response({'ip': '203.0.113.7'})
+
+    async def geo(self, request):
+        self.hits['geo'] += 1
+        ip = request.match_info['ip']
+        if self._failing(request):
+            return web.Response(status=500)
+        if ip == 'malformed':
+            return web.json_response([])   # not an object: fails in geolocate_ip, not in aiohttp
+        return web.json_response({'city': 'Midland', 'region': 'Texas', 'country_name': 'United States',
+                                  'latitude': 31.99, 'longitude': -102.08})
+
+    async def weather(self, request):
+        self.hits['weather'] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(WEATHER_DELAY)
+            if self._failing(request):
+                return web.Response(status=503)
+            return web.Response(text=f"weather at {request.match_info['site']} ({request.query_string})")
+        finally:
+            self.in_flight -= 1
+
+
+@asynccontextmanager
+async def stub_client(**options):
+    '''(stub, WeatherClient pointed at it) for the duration of the block.'''
+    stub = Stub()
+    app = web.Application()
+    app.add_routes([web.get('/', stub.ip), web.get('/{ip}/json', stub.geo), web.get('/{site}', stub.weather)])
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    try:
+        async with WeatherClient(ip_url=base_url, geo_url=base_url, wttr_url=base_url, **options) as client:
+            yield stub, client
+    finally:
+        await runner.cleanup()
+
+
+def run(scenario):
+    return asyncio.run(scenario())
+
+
+def test_public_ip_and_location():
+    async def scenario():
+        async with stub_client() as (stub, client):
+            ip = await client.get_public_ip()
+            assert ip == '203.0.113.7'
+            assert await client.geolocate_ip(ip) == {'city': 'Midland', 'region': 'Texas',
+                                                     'country': 'United States', 'lat': 31.99, 'lon': -102.08}
+    run(scenario)
+
+
+def test_caches_hit_then_expire():
+    async def scenario():
+        async with stub_client(location_ttl=0.2, weather_ttl=0.2) as (stub, client):
+            for _ in range(3):
+                await client.geolocate_ip('203.0.113.7')
+                await client.fetch_weather_ascii(31.99, -102.08)
+            assert stub.hits['geo'] == 1 and stub.hits['weather'] == 1
+
+            # Another unit system is another weather report
+            await client.fetch_weather_ascii(31.99, -102.08, 'm')
+            assert stub.hits['weather'] == 2
+
+            await asyncio.sleep(0.3)
+            await client.geolocate_ip('203.0.113.7')
+            await client.fetch_weather_ascii(31.99, -102.08)
+            assert stub.hits['geo'] == 2 and stub.hits['weather'] == 3
+    run(scenario)
+
+
+def test_concurrent_calls_share_one_fetch():
+    async def scenario():
+        async with stub_client() as (stub, client):
+            reports = await asyncio.gather(*(client.fetch_weather_ascii(31.99, -102.08) for _ in range(10)))
+            locations = await asyncio.gather(*(client.geolocate_ip('203.0.113.7') for _ in range(10)))
+            assert len(set(reports)) == 1 and stub.hits['weather'] == 1
+            assert all(location == locations[0] for location in locations) and stub.hits['geo'] == 1
+    run(scenario)
+
+
+def test_failures_are_not_cached():
+    async def scenario():
+        async with stub_client() as (stub, client):
+            stub.fail('/31.99,-102.08')
+            with pytest.raises(aiohttp.ClientResponseError):
+                await client.fetch_weather_ascii(31.99, -102.08)
+            assert await client.fetch_weather_ascii(31.99, -102.08) == 'weather at 31.99,-102.08 (u)'
+            assert stub.hits['weather'] == 2
+
+            stub.fail('/203.0.113.7/json')
+            with pytest.raises(aiohttp.ClientResponseError):
+                await client.geolocate_ip('203.0.113.7')
+            assert (await client.geolocate_ip('203.0.113.7'))['city'] == 'Midland'
+
+            # Errors other than those of aiohttp are not cached either
+            for _ in range(2):
+                with pytest.raises(AttributeError):
+                    await client.geolocate_ip('malformed')
+            assert stub.hits['geo'] == 4
+    run(scenario)
+
+
+def test_failure_does_not_evict_a_newer_fetch():
+    async def scenario():
+        async with stub_client() as (stub, client):
+            stub.fail('/1.0,2.0')
+            failed = asyncio.ensure_future(client.fetch_weather_ascii(1.0, 2.0))
+            with pytest.raises(aiohttp.ClientResponseError):
+                await failed
+            assert client.weather.get((1.0, 2.0, 'u')) is None
+            assert await client.fetch_weather_ascii(1.0, 2.0) == 'weather at 1.0,2.0 (u)'
+            cached = client.weather.get((1.0, 2.0, 'u'))
+
+            # A late eviction for another failed fetch of the key leaves the successful one in place
+            stale = asyncio.get_running_loop().create_future()
+            stale.set_exception(RuntimeError('stale'))
+            client._evict_failed(client.weather, (1.0, 2.0, 'u'), stale)
+            assert client.weather.get((1.0, 2.0, 'u')) is cached
+            assert stub.hits['weather'] == 2
+    run(scenario)
+
+
+def test_batch_keeps_order_and_returns_errors():
+    async def scenario():
+        async with stub_client(concurrency=3) as (stub, client):
+            sites = [(30 + i, -100 - i) for i in range(12)]
+            stub.fail('/35,-105')
+            reports = await client.fetch_weather_batch(sites, 'm')
+            assert len(reports) == len(sites)
+            for (lat, lon), report in zip(sites, reports):
+                if (lat, lon) == (35, -105):
+                    assert isinstance(report, aiohttp.ClientResponseError) and report.status == 503
+                else:
+                    assert report == f'weather at {lat},{lon} (m)'
+            assert stub.max_in_flight == 3
+    run(scenario)
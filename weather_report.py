@@ -1,40 +1,179 @@
-import requests
-from colorama import init, Fore, Style
+'''
+Public IP, location and wttr.in weather report, with one asyncio HTTP client.
+
+WeatherClient keeps one aiohttp session, so every request reuses the
+connections of a shared pool instead of opening its own. IP locations are
+cached for LOCATION_TTL seconds and weather reports per (lat, lon, units) for
+WEATHER_TTL seconds; requests for a key that is already being fetched wait for
+that fetch instead of sending another one. fetch_weather_batch() gets the
+weather of many sites (well sites) concurrently, at most `concurrency` at a
+time.
+
+The base URLs of the three services can be given to WeatherClient (or set with
+WEATHER_IP_URL, WEATHER_GEO_URL and WEATHER_WTTR_URL), for a local stub server.
+
+Usage:
+    python weather_report.py                                  # weather where this machine is
+    python weather_report.py --site 31.9,-102.1 --site 47.8,-103.3 --units m
+'''
+import argparse
+import asyncio
+import os
+import time
+
+import aiohttp
+from colorama import init, Fore
 
 init(autoreset=True)
 
+IP_URL = os.environ.get('WEATHER_IP_URL', 'https://api.ipify.org')
+GEO_URL = os.environ.get('WEATHER_GEO_URL', 'https://ipapi.co')
+WTTR_URL = os.environ.get('WEATHER_WTTR_URL', 'https://wttr.in')
+
+# Seconds a location and a weather report are reused
+LOCATION_TTL = 24 * 3600
+WEATHER_TTL = 10 * 60
+
+# Connections of the pool, and requests of a batch in flight at once
+POOL_SIZE = 20
+CONCURRENCY = 10
+
+# Seconds for the IP and location services, and for wttr.in
+TIMEOUT = 10
+WEATHER_TIMEOUT = 15
+
+
+class TTLCache:
+    '''Values of keys for ttl seconds, at most maxsize of them (the oldest are dropped first).'''
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = {}   # key -> (expiry, value), oldest first
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[key]
+            return None
+        return entry[1]
+
+    def set(self, key, value):
+        self.entries.pop(key, None)
+        while len(self.entries) >= self.maxsize:
+            del self.entries[next(iter(self.entries))]
+        self.entries[key] = time.monotonic() + self.ttl, value
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+
+class WeatherClient:
+    '''The three services over one pooled session, with cached locations and weather reports.'''
+
+    def __init__(self, ip_url=IP_URL, geo_url=GEO_URL, wttr_url=WTTR_URL, location_ttl=LOCATION_TTL,
+                 weather_ttl=WEATHER_TTL, pool_size=POOL_SIZE, concurrency=CONCURRENCY):
+        self.ip_url = ip_url.rstrip('/')
+        self.geo_url = geo_url.rstrip('/')
+        self.wttr_url = wttr_url.rstrip('/')
+        self.pool_size = pool_size
+        self.concurrency = concurrency
+        # The caches hold tasks, so that concurrent requests for one key share a fetch
+        self.locations = TTLCache(location_ttl)
+        self.weather = TTLCache(weather_ttl)
+        self.session = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        self.session = None
+
+    async def _get(self, url, timeout, json=True, **params):
+        async with self.session.get(url, params=params or None,
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+            r.raise_for_status()
+            return await r.json(content_type=None) if json else await r.text()
+
+    async def _cached(self, cache, key, fetch):
+        task = cache.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            cache.set(key, task)
+            task.add_done_callback(lambda done: self._evict_failed(cache, key, done))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _evict_failed(cache, key, task):
+        '''A failure is not cached, whatever the error; a newer task of the key stays.'''
+        if (task.cancelled() or task.exception() is not None) and cache.get(key) is task:
+            cache.discard(key)
+
+    async def get_public_ip(self):
+        j = await self._get(self.ip_url, TIMEOUT, format='json')
+        return j.get('ip')
+
+    async def geolocate_ip(self, ip):
+        async def fetch():
+            j = await self._get(f'{self.geo_url}/{ip}/json', TIMEOUT)
+            return {
+                "city": j.get("city") or "",
+                "region": j.get("region") or "",
+                "country": j.get("country_name") or "",
+                "lat": j.get("latitude"),
+                "lon": j.get("longitude"),
+            }
+
+        return await self._cached(self.locations, ip, fetch)
+
+    async def fetch_weather_ascii(self, lat, lon, units="u"):
+        url = f"{self.wttr_url}/{lat},{lon}?{units}"
+        return await self._cached(self.weather, (lat, lon, units),
+                                  lambda: self._get(url, WEATHER_TIMEOUT, json=False))
+
+    async def fetch_weather_batch(self, sites, units="u"):
+        '''Weather report of every (lat, lon) site, in order; the exception instead for a site that failed.'''
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(lat, lon):
+            async with semaphore:
+                return await self.fetch_weather_ascii(lat, lon, units)
 
-def get_public_ip():
-    r = requests.get('https://api.ipify.org?format=json', timeout=10)
-    return r.json().get('ip')
+        return await asyncio.gather(*(fetch(lat, lon) for lat, lon in sites), return_exceptions=True)
 
 
-def geolocate_ip(ip):
-    r = requests.get(f'https://ipapi.co/{ip}/json', timeout=10)
-    j = r.json()
+def parse_site(text):
+    lat, lon = text.split(',')
+    return float(lat), float(lon)
 
-    return {
-        "city": j.get("city") or "",
-        "region": j.get("region") or "",
-        "country": j.get("country_name") or "",
-        "lat": j.get("latitude"),
-        "lon": j.get("longitude"),
-    }
 
+async def report(sites=(), units="u"):
+    async with WeatherClient() as client:
+        if not sites:
+            ip = await client.get_public_ip()
+            print(Fore.GREEN + f"Your public IP: {ip}")
+            loc = await client.geolocate_ip(ip)
+            print(Fore.YELLOW +
+                  f"Location: {loc['city']}, {loc['region']}, {loc['country']}")
+            print(await client.fetch_weather_ascii(loc['lat'], loc['lon'], units))
+            return
 
-def fet_weather_ascii(lat, lon, units="u"):
-    url = f"https://wttr.in/{lat},{lon}?{units}"
-    r = requests.get(url, timeout=15)
-    return r.text
+        for (lat, lon), weather in zip(sites, await client.fetch_weather_batch(sites, units)):
+            print(Fore.YELLOW + f"Site: {lat}, {lon}")
+            print(Fore.RED + f"Error: {weather!r}" if isinstance(weather, Exception) else weather)
 
 
 def main():
-    ip = get_public_ip()
-    print(Fore.GREEN + f"Your public IP: {ip}")
-    loc = geolocate_ip(ip)
-    print(Fore.YELLOW +
-          f"Location: {loc['city']}, {loc['region']}, {loc['country']}")
-    print(fet_weather_ascii(loc['lat'], loc['lon']))
+    parser = argparse.ArgumentParser(description='Weather report of this machine, or of some sites at once.')
+    parser.add_argument('--site', type=parse_site, action='append', default=[],
+                        help='LAT,LON of a site; may be repeated')
+    parser.add_argument('--units', default='u', help='wttr.in units: u (USCS), m (metric) or M')
+    args = parser.parse_args()
+    asyncio.run(report(args.site, args.units))
 
 
 if __name__ == "__main__":
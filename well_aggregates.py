@@ -0,0 +1,150 @@
+'''
+Per-well aggregates of production columns, maintained incrementally.
+
+The aggregates are computed once when the data is loaded, then updated with
+append() from the new rows only: running sums and non-null counts give the
+mean and the cumulative value, the row with the latest date gives the last
+value, and a sorted copy of every well's values gives exact percentiles by
+index. Nothing is recomputed over the whole table.
+
+Example:
+    aggregates = WellAggregates(production_data, ['OIL_RATE', 'WATER_RATE', 'WATER_CUT'])
+    aggregates.means()                  # same as groupby('WELL').agg('mean').reset_index()
+    aggregates.append(new_rows)
+    aggregates.table()                  # <COLUMN>_MEAN, _CUM, _LAST, _COUNT per well
+    aggregates.percentiles(90)
+'''
+import numpy as np
+import pandas as pd
+
+
+def quantile_sorted(values, q):
+    '''q-th percentile of sorted values without NaN (linear interpolation, like numpy).'''
+    n = values.shape[0]
+    if n == 0:
+        return np.nan
+    position = q / 100 * (n - 1)
+    lower = int(np.floor(position))
+    upper = min(lower + 1, n - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def group_sort(codes, values, ngroups):
+    '''Order that sorts values by (code, value): a value sort, then a stable sort on the codes.'''
+    order = np.argsort(values)
+    group = codes[order]
+    if ngroups <= np.iinfo(np.uint16).max:
+        group = group.astype(np.uint16)    # stable sort of 16-bit integers is a radix sort
+    return order[np.argsort(group, kind='stable')]
+
+
+class WellAggregates:
+    '''Running per-well sums, counts, last values and sorted values of some columns.'''
+
+    def __init__(self, frame, columns, key='WELL', date='DATE'):
+        self.key = key
+        self.date = date
+        self.columns = list(columns)
+        self.sums = pd.DataFrame(columns=self.columns, dtype=float)
+        self.counts = pd.DataFrame(columns=self.columns, dtype=np.int64)
+        self.last = pd.DataFrame(columns=self.columns, dtype=float)
+        self.last_date = pd.Series(dtype='datetime64[ns]')
+        self.sorted_values = {}   # well -> {column: sorted non-null values}
+        self.rows = 0
+        self.append(frame)
+
+    def copy(self):
+        '''An independent copy, to append to while readers keep using this one.'''
+        other = WellAggregates.__new__(WellAggregates)
+        other.__dict__.update(self.__dict__)
+        other.sorted_values = {well: dict(columns) for well, columns in self.sorted_values.items()}
+        return other
+
+    @property
+    def wells(self):
+        return list(self.sums.index)
+
+    def append(self, frame):
+        '''Add new rows (any order, any wells) to the aggregates.'''
+        if frame.empty or self.key not in frame.columns:
+            return self
+        codes, labels = pd.factorize(frame[self.key].to_numpy())
+        values = frame[self.columns].to_numpy(dtype=float)
+        wells = pd.Index(labels)
+        valid = ~np.isnan(values)
+
+        # Running sums and non-null counts
+        sums = np.zeros((len(labels), len(self.columns)))
+        counts = np.zeros((len(labels), len(self.columns)), dtype=np.int64)
+        for i in range(len(self.columns)):
+            sums[:, i] = np.bincount(codes, weights=np.where(valid[:, i], values[:, i], 0.0), minlength=len(labels))
+            counts[:, i] = np.bincount(codes, weights=valid[:, i], minlength=len(labels))
+        self.sums = self.sums.add(pd.DataFrame(sums, index=wells, columns=self.columns), fill_value=0)
+        self.counts = self.counts.add(pd.DataFrame(counts, index=wells, columns=self.columns),
+                                      fill_value=0).astype(np.int64)
+
+        # Last value: the latest row of every well (the last one on equal dates),
+        # kept only if not older than the stored one
+        if self.date in frame.columns:
+            dates = pd.to_datetime(frame[self.date]).to_numpy()
+            order = np.argsort(dates, kind='stable')
+        else:
+            dates = None
+            order = np.arange(len(codes))
+        rank = np.empty(len(codes), dtype=np.int64)
+        rank[order] = np.arange(len(codes))
+        latest = np.full(len(labels), -1, dtype=np.int64)
+        np.maximum.at(latest, codes, rank)
+        rows = order[latest]
+        last = pd.DataFrame(values[rows], index=wells, columns=self.columns)
+        if dates is not None:
+            last_date = pd.Series(dates[rows], index=wells)
+            previous = self.last_date.reindex(wells)
+            newer = (previous.isna() | (last_date >= previous)).to_numpy()
+            last, last_date = last[newer], last_date[newer]
+            self.last_date = pd.concat([self.last_date.drop(last_date.index, errors='ignore'), last_date])
+        self.last = pd.concat([self.last.drop(last.index, errors='ignore'), last])
+
+        # Sort the new values by (well, value) once per column, then merge them
+        # into the sorted values of the wells they belong to
+        for i, column in enumerate(self.columns):
+            column_codes, column_values = codes[valid[:, i]], values[valid[:, i], i]
+            order = group_sort(column_codes, column_values, len(labels))
+            bounds = np.searchsorted(column_codes[order], np.arange(len(labels) + 1))
+            column_values = column_values[order]
+            for code, well in enumerate(labels):
+                new = column_values[bounds[code]:bounds[code + 1]]
+                merged = self.sorted_values.setdefault(well, {})
+                if column in merged:
+                    # Both are sorted: insert the new values at their places, no re-sort of the history
+                    stored = merged[column]
+                    new = np.insert(stored, np.searchsorted(stored, new, side='right'), new) if len(new) else stored
+                merged[column] = new
+        self.rows += len(codes)
+        return self
+
+    def means(self):
+        '''Mean of every column per well, as a DataFrame with the key column.'''
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sums / self.counts.replace(0, np.nan)
+        return means.rename_axis(self.key).reset_index()
+
+    def percentile(self, well, column, q):
+        return quantile_sorted(self.sorted_values.get(well, {}).get(column, np.array([])), q)
+
+    def percentiles(self, q):
+        '''q-th percentile of every column per well, as a DataFrame with the key column.'''
+        table = pd.DataFrame({column: [self.percentile(well, column, q) for well in self.sums.index]
+                              for column in self.columns}, index=self.sums.index)
+        return table.rename_axis(self.key).reset_index()
+
+    def table(self):
+        '''Mean, cumulative (sum), last value and count of every column per well.'''
+        means = self.means().set_index(self.key)
+        parts = {}
+        for column in self.columns:
+            parts[f'{column}_MEAN'] = means[column]
+            parts[f'{column}_CUM'] = self.sums[column]
+            parts[f'{column}_LAST'] = self.last[column].reindex(self.sums.index)
+            parts[f'{column}_COUNT'] = self.counts[column]
+        return pd.DataFrame(parts).rename_axis(self.key).reset_index()
@@ -0,0 +1,161 @@
+'''
+Zone (formation tops) statistics for one or many wells.
+
+Every sample is assigned to the zone whose top is the deepest one above it in
+the same well, with a single binary search over all tops of all wells, and
+every statistic is a segment reduction (numpy.bincount) over the zone ids.
+There is no Python loop over wells or zones, so thousands of wells with dozens
+of zones each cost a sort and a few passes over the samples.
+
+Per zone (one row per WELL/ZONE, like reservoir_statistics.csv has per well):
+- TOP, BOTTOM: depth of the top and of the next top (or last sample);
+- GROSS: thickness of the samples in the zone;
+- NET: thickness of reservoir, VCL < vcl_cutoff and PHIE > phie_cutoff;
+- NTG: NET / GROSS;
+- PAY: thickness of net reservoir that also has SW < sw_cutoff;
+- PHIE, SW, VCL: thickness-weighted averages over the zone (NaN ignored);
+- HCPV: sum of PHIE * (1 - SW) * thickness over the pay.
+
+Example:
+    tops = pd.DataFrame({'ZONE': tops_names, 'TOP': tops_depths})
+    zone_statistics(None, logs.DEPT, logs.VCL, logs.PHIE, logs.SWa, tops)
+'''
+import numpy as np
+import pandas as pd
+
+DEFAULT_CUTOFFS = {'vcl_cutoff': 0.4, 'phie_cutoff': 0.1, 'sw_cutoff': 0.5}
+
+STATISTICS_COLUMNS = ['WELL', 'ZONE', 'TOP', 'BOTTOM', 'GROSS', 'NET', 'NTG', 'PAY', 'PHIE', 'SW', 'VCL', 'HCPV']
+
+
+def _codes(wells, n):
+    '''Integer well codes and their labels; None means a single unnamed well.'''
+    if wells is None:
+        return np.zeros(n, dtype=np.int64), np.array([''], dtype=object)
+    codes, labels = pd.factorize(np.asarray(wells), sort=True)
+    return codes.astype(np.int64), np.asarray(labels, dtype=object)
+
+
+def sample_thickness(well_codes, depth):
+    '''Thickness of each sample: the distance to the next sample of the same well
+    (or to the previous one for the last sample of a well).'''
+    n = depth.shape[0]
+    thickness = np.zeros(n)
+    if n < 2:
+        return thickness
+    step = np.diff(depth)
+    same = well_codes[1:] == well_codes[:-1]
+    thickness[:-1] = np.where(same, step, np.nan)
+    last = np.isnan(thickness)
+    last[-1] = True
+    previous = np.concatenate([[np.nan], np.where(same, step, np.nan)])
+    thickness[last] = previous[last]
+    return np.nan_to_num(np.abs(thickness))
+
+
+def assign_zones(sample_codes, depth, top_codes, top_depths):
+    '''Index (into the sorted tops) of the zone of every sample, -1 when above the first top.
+
+    sample and top codes must be the same integer well codes. Keys are
+    well * span + depth, so one searchsorted covers every well at once.
+    '''
+    lo = min(np.nanmin(depth) if depth.size else 0.0, np.nanmin(top_depths) if top_depths.size else 0.0)
+    hi = max(np.nanmax(depth) if depth.size else 0.0, np.nanmax(top_depths) if top_depths.size else 0.0)
+    span = hi - lo + 1.0
+    top_keys = top_codes * span + (top_depths - lo)
+    sample_keys = sample_codes * span + (depth - lo)
+
+    zone = np.searchsorted(top_keys, sample_keys, side='right') - 1
+    outside = (zone < 0) | (top_codes[np.maximum(zone, 0)] != sample_codes) | np.isnan(depth)
+    zone[outside] = -1
+    return zone
+
+
+def zone_statistics(wells, depth, vcl, phie, sw, tops, thickness=None, cutoffs=None):
+    '''Statistics of every zone of every well as a DataFrame (see module docstring).
+
+    wells: well name per sample, or None for a single well. tops: DataFrame
+    with ZONE and TOP columns, and WELL when wells is given. thickness: per
+    sample, default from the depth spacing.
+    '''
+    c = dict(DEFAULT_CUTOFFS, **(cutoffs or {}))
+    depth = np.asarray(depth, dtype=float)
+    vcl, phie, sw = (np.asarray(values, dtype=float) for values in (vcl, phie, sw))
+    n = depth.shape[0]
+
+    if wells is None:
+        sample_codes, labels = _codes(None, n)
+        top_codes = np.zeros(len(tops), dtype=np.int64)
+    else:
+        sample_codes, labels = _codes(wells, n)
+        lookup = pd.Index(labels)
+        top_codes = lookup.get_indexer(tops['WELL'].to_numpy())
+    known = top_codes >= 0
+    top_codes = top_codes[known]
+    top_depths = tops['TOP'].to_numpy(dtype=float)[known]
+    top_names = tops['ZONE'].to_numpy()[known]
+
+    # Sort samples and tops by (well, depth) once
+    order = np.lexsort((depth, sample_codes))
+    sample_codes, depth, vcl, phie, sw = (a[order] for a in (sample_codes, depth, vcl, phie, sw))
+    top_order = np.lexsort((top_depths, top_codes))
+    top_codes, top_depths, top_names = top_codes[top_order], top_depths[top_order], top_names[top_order]
+
+    if thickness is None:
+        thickness = sample_thickness(sample_codes, depth)
+    else:
+        thickness = np.broadcast_to(np.asarray(thickness, dtype=float), (n,))[order]
+
+    zone = assign_zones(sample_codes, depth, top_codes, top_depths)
+    inside = zone >= 0
+    zone, h = zone[inside], thickness[inside]
+    vcl, phie, sw, depth = vcl[inside], phie[inside], sw[inside], depth[inside]
+    nzones = top_codes.shape[0]
+
+    def total(weights):
+        return np.bincount(zone, weights=weights, minlength=nzones)
+
+    def average(values):
+        finite = np.isfinite(values)
+        weight = total(np.where(finite, h, 0.0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return total(np.where(finite, values * h, 0.0)) / weight
+
+    with np.errstate(invalid='ignore'):
+        net = (vcl < c['vcl_cutoff']) & (phie > c['phie_cutoff'])
+        pay = net & (sw < c['sw_cutoff'])
+    gross = total(h)
+    net_h = total(np.where(net, h, 0.0))
+
+    # BOTTOM: the next top of the same well, else the deepest sample of the zone
+    deepest = np.full(nzones, np.nan)
+    if zone.size:
+        np.fmax.at(deepest, zone, depth)
+    next_top = np.append(top_depths[1:], np.nan)
+    same_well = np.append(top_codes[1:] == top_codes[:-1], False)
+    bottom = np.where(same_well, next_top, deepest)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats = pd.DataFrame({
+            'WELL': labels[top_codes],
+            'ZONE': top_names,
+            'TOP': top_depths,
+            'BOTTOM': bottom,
+            'GROSS': gross,
+            'NET': net_h,
+            'NTG': net_h / gross,
+            'PAY': total(np.where(pay, h, 0.0)),
+            'PHIE': average(phie),
+            'SW': average(sw),
+            'VCL': average(vcl),
+            'HCPV': total(np.where(pay, np.nan_to_num(phie * (1 - sw)) * h, 0.0)),
+        }, columns=STATISTICS_COLUMNS)
+    if wells is None:
+        stats = stats.drop(columns='WELL')
+    return stats
+
+
+def zone_statistics_from_results(results, tops, cutoffs=None):
+    '''zone_statistics() over batch interpretation results (WELL, DEPTH, VSHALE, POROSITY, SW columns).'''
+    return zone_statistics(results['WELL'], results['DEPTH'], results['VSHALE'], results['POROSITY'],
+                           results['SW'], tops, cutoffs=cutoffs)